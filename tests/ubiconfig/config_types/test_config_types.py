@@ -1,6 +1,9 @@
+import pickle
+
 import pytest
 
-from ubiconfig.config_types import content_sets, flags, modules, packages
+from ubiconfig.config_types import UbiConfig, content_sets, flags, modules, packages
+from ubiconfig.config_types.interner import Interner
 
 
 def test_package_with_arch():
@@ -48,6 +51,110 @@ def test_packages():
     assert len(pkgs.blacklist) == 2
 
 
+@pytest.mark.parametrize(
+    "name, arch, included, excluded",
+    [
+        ("python2.7", "x86_64", True, False),
+        ("python2.7", None, True, False),
+        ("yum", "ppc64le", True, False),
+        ("glibc", "i686", True, False),
+        ("glibc", "ppc64le", False, False),
+        ("glibc", None, False, False),
+        ("kernel", "x86_64", False, True),
+        ("kernel-headers", None, False, True),
+        ("linux-firmware", "noarch", False, True),
+        ("firmware", "noarch", False, False),
+        ("gcc-debuginfo", "i686", False, True),
+        ("gcc-debuginfo", "ppc64le", False, False),
+        ("gcc", "i686", False, False),
+        ("dbus.libs", "ppc64le", False, True),
+    ],
+)
+def test_package_matcher(name, arch, included, excluded):
+    include = ["python2.7", "yum.*", "glibc.i686"]
+    exclude = ["linux-firmware", "kernel*", "*-debuginfo.i686", "dbus.*.*"]
+    arches = ["i686", "ppc64le"]
+    matcher = packages.Packages(include, exclude, arches).matcher()
+
+    assert matcher.is_included(name, arch) is included
+    assert matcher.is_excluded(name, arch) is excluded
+
+
+MASK_PACKAGES = [
+    ("python2.7", "x86_64"),
+    ("glibc", "i686"),
+    ("glibc", "ppc64le"),
+    ("kernel", "x86_64"),
+    ("gcc-debuginfo", "i686"),
+    ("gcc-debuginfo", "ppc64le"),
+    ("glibc", "i686"),
+    ("vim", None),
+]
+
+
+def test_package_masks():
+    pkgs = packages.Packages(
+        ["python2.7", "glibc.i686"], ["kernel*", "*-debuginfo.i686"], ["i686"]
+    )
+    matcher = pkgs.matcher()
+    names, arches = zip(*MASK_PACKAGES)
+
+    included, excluded = pkgs.masks(names, arches)
+
+    assert included == [matcher.is_included(n, a) for n, a in MASK_PACKAGES]
+    assert excluded == [matcher.is_excluded(n, a) for n, a in MASK_PACKAGES]
+    assert included == [True, True, False, False, False, False, True, False]
+    assert excluded == [False, False, False, True, True, False, False, False]
+    # without arches, only entries of any arch match
+    assert pkgs.masks(names)[0] == [
+        True,
+        False,
+        False,
+        False,
+        False,
+        False,
+        False,
+        False,
+    ]
+
+
+def test_package_masks_numpy():
+    numpy = pytest.importorskip("numpy")
+    pkgs = packages.Packages(
+        ["python2.7", "glibc.i686"], ["kernel*", "*-debuginfo.i686"], ["i686"]
+    )
+    names, arches = zip(*MASK_PACKAGES)
+
+    included, excluded = pkgs.masks(numpy.array(names), numpy.array(arches))
+
+    assert included.dtype == bool
+    assert included.tolist() == pkgs.masks(names, arches)[0]
+    assert excluded.tolist() == pkgs.masks(names, arches)[1]
+
+
+def test_package_masks_match_single_calls():
+    pkgs = packages.Packages(
+        ["vim", "glibc.i686", "python3.x86_64", "gcc.*"],
+        ["kernel*", "*-debuginfo.i686", "*-devel*.s390x", "perl.x86_64", "*doc"],
+        ["i686", "x86_64", "s390x"],
+    )
+    matcher = pkgs.matcher()
+    names = ["vim", "glibc", "python3", "gcc", "kernel-rt", "a-debuginfo"]
+    names += ["b-devel-x", "perl", "doc", "mydoc", "kernel\nvim", ""]
+    rows = [(n, a) for n in names for a in ["i686", "x86_64", "s390x", "", None]]
+
+    included, excluded = matcher.masks(*zip(*rows))
+
+    assert included == [matcher.is_included(n, a) for n, a in rows]
+    assert excluded == [matcher.is_excluded(n, a) for n, a in rows]
+
+
+def test_package_masks_length_mismatch():
+    pkgs = packages.Packages(["vim"], [], [])
+    with pytest.raises(ValueError):
+        pkgs.masks(["vim", "gcc"], ["x86_64"])
+
+
 def test_modules():
     data = {
         "include": [
@@ -64,6 +171,31 @@ def test_modules():
     assert repr(md[1]) == "<Module: nodejs>"
 
 
+def test_modules_lookup():
+    data = {
+        "include": [
+            {"name": "nodejs", "stream": 8, "profiles": ["interpreter"]},
+            {"name": "nodejs", "stream": 8, "profiles": ["development"]},
+            {"name": "nodejs", "stream": 10},
+            {"name": "perl", "stream": "5.30", "profiles": []},
+        ]
+    }
+    md = modules.Modules.load_from_dict(data)
+
+    assert md.contains("nodejs", 8)
+    assert md.contains("nodejs", "8", "interpreter")
+    assert md.contains("nodejs", "8", "development")
+    assert not md.contains("nodejs", "8", "minimal")
+    # no profiles means all profiles
+    assert md.contains("nodejs", "10", "minimal")
+    assert md.contains("perl", "5.30", "common")
+    assert not md.contains("nodejs", "12")
+    assert not md.contains("ruby", "2.5")
+
+    assert md.streams_for("nodejs") == ["8", "10"]
+    assert md.streams_for("ruby") == []
+
+
 def test_content_sets():
     data = {
         "rpm": {
@@ -125,3 +257,130 @@ def test_flags_as_dict():
     flags_dict = parsed_flags.as_dict()
 
     assert data == flags_dict
+
+
+def test_flags_pickle():
+    parsed_flags = flags.Flags.load_from_dict({"base_pkgs_only": "true"})
+
+    restored = pickle.loads(pickle.dumps(parsed_flags))
+
+    assert restored.base_pkgs_only.value is True
+    assert restored.as_dict() == {"base_pkgs_only": True}
+
+
+def test_models_are_slotted():
+    config = UbiConfig.load_from_dict(
+        {
+            "content_sets": {"rpm": {"input": "in", "output": "out"}},
+            "packages": {"include": ["glibc.i686"], "exclude": ["kernel*"]},
+            "modules": {"include": [{"name": "nodejs", "stream": 8}]},
+            "flags": {"base_pkgs_only": "true"},
+            "arches": ["i686"],
+        },
+        "ubi8/config.yaml",
+        "8",
+    )
+    objects = [
+        config,
+        config.content_sets,
+        config.content_sets.rpm,
+        config.packages,
+        config.packages.whitelist[0],
+        config.packages.blacklist[0],
+        config.modules,
+        config.modules[0],
+        config.flags,
+        config.flags.base_pkgs_only,
+    ]
+
+    for obj in objects:
+        assert not hasattr(obj, "__dict__"), obj
+
+    restored = pickle.loads(pickle.dumps(config))
+    assert restored.packages.whitelist[0].arch == "i686"
+    assert restored.modules.contains("nodejs", "8")
+    assert restored.flags.base_pkgs_only.value is True
+
+
+def test_interner_shares_equal_parts():
+    data = {
+        "content_sets": {"rpm": {"input": "in", "output": "out"}},
+        "packages": {"include": ["glibc.i686", "vim"], "exclude": ["kernel*"]},
+        "modules": {"include": [{"name": "nodejs", "stream": 8}]},
+        "flags": {"base_pkgs_only": "true"},
+        "arches": ["i686"],
+    }
+    other = dict(data, packages={"include": ["glibc.i686", "gcc"], "exclude": []})
+    interner = Interner()
+
+    config_8 = UbiConfig.load_from_dict(data, "config.yaml", "8", interner)
+    config_81 = UbiConfig.load_from_dict(data, "config.yaml", "8.1", interner)
+    config_82 = UbiConfig.load_from_dict(other, "config.yaml", "8.2", interner)
+
+    assert config_8.packages is config_81.packages
+    assert config_8.modules is config_81.modules
+    assert config_8.content_sets is config_82.content_sets
+    assert config_8.flags is config_82.flags
+    # packages are shared even if the lists differ
+    assert config_8.packages is not config_82.packages
+    assert config_8.packages.whitelist[0] is config_82.packages.whitelist[0]
+    assert config_8.version == "8" and config_81.version == "8.1"
+    assert config_81.modules.contains("nodejs", "8")
+    assert config_81.flags.base_pkgs_only.value is True
+
+
+def test_value_equality():
+    arches = ["i686"]
+    assert packages.IncludePackage("glibc.i686", arches) == packages.IncludePackage(
+        "glibc.i686", arches
+    )
+    assert packages.IncludePackage("glibc", arches) != packages.ExcludePackage(
+        "glibc", arches
+    )
+    assert len(set([modules.Module("nodejs", 8), modules.Module("nodejs", "8")])) == 1
+    assert flags.Flags.load_from_dict({"a": "true", "b": "x"}) == flags.Flags(
+        [flags.Flag("b", "x"), flags.Flag("a", True)]
+    )
+
+
+def test_config_diff():
+    old_data = {
+        "content_sets": {"rpm": {"input": "in", "output": "out"}},
+        "packages": {"include": ["glibc.i686", "vim"], "exclude": ["kernel*"]},
+        "modules": {"include": [{"name": "nodejs", "stream": 8}]},
+        "flags": {"base_pkgs_only": "true"},
+        "arches": ["i686"],
+    }
+    new_data = {
+        "content_sets": {"rpm": {"input": "in", "output": "out-2"}},
+        "packages": {"include": ["vim", "gcc"], "exclude": ["kernel*"]},
+        "modules": {
+            "include": [
+                {"name": "nodejs", "stream": 8},
+                {"name": "perl", "stream": "5.30"},
+            ]
+        },
+        "flags": {"base_pkgs_only": "false"},
+        "arches": ["i686"],
+    }
+    old = UbiConfig.load_from_dict(old_data, "config.yaml", "8")
+    new = UbiConfig.load_from_dict(new_data, "config.yaml", "8")
+
+    diff = old.diff(new)
+
+    assert [p.package for p in diff.packages.added] == ["gcc"]
+    assert [p.package for p in diff.packages.removed] == ["glibc.i686"]
+    assert not diff.blacklist
+    assert [m.name for m in diff.modules.added] == ["perl"]
+    assert [f.value for f in diff.flags.added] == [False]
+    assert [f.value for f in diff.flags.removed] == [True]
+    assert [(m.type, m.output) for m in diff.content_sets.added] == [("rpm", "out-2")]
+    assert [(m.type, m.output) for m in diff.content_sets.removed] == [("rpm", "out")]
+    assert repr(diff) == (
+        "<ConfigDiff: packages +1 -1, modules +1 -0, flags +1 -1, content_sets +1 -1>"
+    )
+
+    assert old != new
+    assert not old.diff(UbiConfig.load_from_dict(old_data, "config.yaml", "8"))
+    assert old == UbiConfig.load_from_dict(old_data, "config.yaml", "8")
+    assert old != UbiConfig.load_from_dict(old_data, "config.yaml", "8.1")
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from ubiconfig import ubi
+
+CONFIGS_DIR = os.path.join(os.path.dirname(__file__), "../data/configs")
+
+
+@pytest.fixture(scope="session")
+def configs_dir():
+    """Directory with configs of the test data, including invalid ones."""
+    return CONFIGS_DIR
+
+
+@pytest.fixture(scope="module")
+def configs(configs_dir):
+    """Valid configs loaded from the test data directory."""
+    return ubi.get_loader(configs_dir).load_all()
@@ -0,0 +1,166 @@
+import asyncio
+import re
+import threading
+
+import pytest
+from mock import patch
+
+from ubiconfig import UbiConfig, ubi
+from ubiconfig._impl.loaders import gitlab_async
+from ubiconfig.utils.api import gitlab
+
+web = pytest.importorskip("aiohttp.web")
+
+CONFIG = "content_sets: {}\npackages:\n  include: [vim]\n"
+
+BRANCHES = [
+    {"name": "ubi8", "commit": {"id": "aaa"}},
+    {"name": "ubi8.1", "commit": {"id": "bbb"}},
+    {"name": "ga-cleanup", "commit": {"id": "ccc"}},
+]
+
+TREES = {
+    "aaa": [
+        {"id": "b1", "name": "a.yaml", "path": "a.yaml", "type": "blob"},
+        {"id": "b2", "name": "bad.yaml", "path": "bad.yaml", "type": "blob"},
+    ],
+    "bbb": [{"id": "b1", "name": "a.yaml", "path": "a.yaml", "type": "blob"}],
+}
+
+
+def make_app():
+    prefix = "/api/v4/projects/foo%2Fbar/repository"
+    app = web.Application()
+    requests = []
+
+    async def branches(request):
+        return web.json_response(BRANCHES)
+
+    async def branch(request):
+        for b in BRANCHES:
+            if b["name"] == request.match_info["name"]:
+                return web.json_response(b)
+        raise web.HTTPNotFound()
+
+    async def tree(request):
+        return web.json_response(TREES[request.query["ref"]])
+
+    async def raw(request):
+        if request.match_info["path"] == "bad.yaml":
+            return web.Response(text="[oops not yaml")
+        return web.Response(text=CONFIG)
+
+    @web.middleware
+    async def record(request, handler):
+        requests.append(request.path_qs)
+        return await handler(request)
+
+    app.middlewares.append(record)
+    app.router.add_get(prefix + "/branches", branches)
+    app.router.add_get(prefix + "/branches/{name}", branch)
+    app.router.add_get(prefix + "/tree", tree)
+    app.router.add_get(prefix + "/files/{path}/raw", raw)
+    return app, requests
+
+
+@pytest.fixture
+def local_url_format(monkeypatch):
+    monkeypatch.setattr(
+        gitlab, "GIT_LAB_URL_FMT", re.compile(r"(?P<host>http://[^/]+)/(?P<project>.+)")
+    )
+
+
+async def serve(app, coro_fn, **kwargs):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        async with ubi.get_loader(
+            "http://127.0.0.1:%s/foo/bar" % port, asynchronous=True, **kwargs
+        ) as loader:
+            return await coro_fn(loader)
+    finally:
+        await runner.cleanup()
+
+
+def test_aload_all(local_url_format):
+    app, _ = make_app()
+    configs = asyncio.run(serve(app, lambda loader: loader.aload_all()))
+
+    assert all(isinstance(c, UbiConfig) for c in configs)
+    assert [(c.file_name, c.version) for c in configs] == [
+        ("a.yaml", "8"),
+        ("a.yaml", "8.1"),
+    ]
+    assert configs[0].packages.whitelist[0].name == "vim"
+
+
+def test_aload_all_parses_outside_event_loop(local_url_format):
+    app, _ = make_app()
+    threads = []
+    parse_config = gitlab_async.parse_config
+
+    def record_thread(*args):
+        threads.append(threading.current_thread())
+        return parse_config(*args)
+
+    with patch.object(gitlab_async, "parse_config", record_thread):
+        configs = asyncio.run(serve(app, lambda loader: loader.aload_all()))
+
+    assert len(configs) == 2
+    assert threads
+    assert threading.main_thread() not in threads
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_aiter_all(local_url_format, ordered):
+    app, _ = make_app()
+    errors = []
+
+    async def collect(loader):
+        return [
+            config
+            async for config in loader.aiter_all(
+                ordered=ordered, on_error=lambda *args: errors.append(args)
+            )
+        ]
+
+    configs = asyncio.run(serve(app, collect))
+
+    assert sorted((c.file_name, c.version) for c in configs) == [
+        ("a.yaml", "8"),
+        ("a.yaml", "8.1"),
+    ]
+    assert [(f, version) for f, version, _ in errors] == [("bad.yaml", "ubi8")]
+
+
+def test_aload_all_tree_path(local_url_format):
+    app, requests = make_app()
+    configs = asyncio.run(
+        serve(app, lambda loader: loader.aload_all(), tree_path="configs")
+    )
+
+    assert len(configs) == 2
+    trees = [r for r in requests if "/tree?" in r]
+    assert len(trees) == 2
+    assert all("path=configs" in r for r in trees)
+
+
+def test_aload_single_branch(local_url_format):
+    app, requests = make_app()
+    config = asyncio.run(serve(app, lambda loader: loader.aload("a.yaml", "ubi8.5")))
+
+    assert config.version == "8"
+    # only the requested branch and its fallback were resolved
+    assert [r.split("?")[0].rsplit("/", 1)[-1] for r in requests] == [
+        "ubi8.5",
+        "ubi8",
+        "raw",
+    ]
+
+
+def test_asynchronous_local_loader(tmpdir):
+    with pytest.raises(ubi.LoaderError):
+        ubi.get_loader(str(tmpdir), asynchronous=True)
@@ -1,11 +1,20 @@
+import io
+import tarfile
+import threading
+
 import pytest
 import requests
 import requests_mock
+import urllib3
 import yaml
 from mock import MagicMock, Mock, patch
 
+from ubiconfig import ubi
 from ubiconfig._impl.loaders import _GitlabLoader
 
+API = "https://some-repo.example.com/api/v4/projects/foo%2Fbar/repository/"
+CONFIG = "content_sets: {}\npackages:\n  include: []\n"
+
 
 def mock_json(value, headers=None):
     out = MagicMock()
@@ -19,23 +28,12 @@ def test_bad_yaml():
     with patch("requests.Session") as mock_session_class:
         session = mock_session_class.return_value
         session.request.side_effect = [
-            # branches
-            mock_json(
-                [
-                    {
-                        "name": "ubi7",
-                        "commit": {"id": "2189cbc2e447f796fe354f8d784d76b0a2620248"},
-                    }
-                ]
-            ),
-            # files and headers
+            # the requested branch
             mock_json(
-                [{"name": "badfile.yaml", "path": "badfile.yaml"}],
-                {"Content-Length": "629", "X-Total-Pages": "2", "X-Per-Page": "20"},
-            ),
-            mock_json(
-                [{"name": "badfile1.yaml", "path": "badfile1.yaml"}],
-                {"Content-Length": "629", "X-Total-Pages": "2", "X-Per-Page": "20"},
+                {
+                    "name": "ubi7",
+                    "commit": {"id": "2189cbc2e447f796fe354f8d784d76b0a2620248"},
+                }
             ),
             # content (not valid yaml!)
             Mock(content="[oops not yaml"),
@@ -53,8 +51,9 @@ def test_bad_json():
             "https://some-repo.example.com/api/v4/projects/foo%2Fbar/repository/branches"
         )
 
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
         with pytest.raises(requests.exceptions.JSONDecodeError):
-            _GitlabLoader("https://some-repo.example.com/foo/bar")
+            loader.load_all()
 
 
 def test_request_error():
@@ -64,5 +63,370 @@ def test_request_error():
             status_code=500,
         )
 
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
         with pytest.raises(requests.exceptions.HTTPError):
-            _GitlabLoader("https://some-repo.example.com/foo/bar")
+            loader.load_all()
+
+
+def test_discovery_is_lazy():
+    with requests_mock.Mocker() as m:
+        m.get(API + "branches/ubi8.6", status_code=404)
+        m.get(API + "branches/ubi8", json={"name": "ubi8", "commit": {"id": "bbb"}})
+        m.get(API + "files/c.yaml/raw?ref=bbb", text=CONFIG)
+        m.get(API + "files/missing.yaml/raw?ref=bbb", status_code=404)
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        assert m.call_count == 0
+
+        config = loader.load("c.yaml", "ubi8.6")
+        # neither the branch list nor any tree was requested
+        assert m.call_count == 3
+        assert config.version == "8"
+
+        with pytest.raises(ValueError):
+            loader.load("missing.yaml", "ubi8")
+
+
+def test_load_all_versions_filter():
+    branches = [
+        {"name": "ubi8", "commit": {"id": "aaa"}},
+        {"name": "ubi9", "commit": {"id": "bbb"}},
+        {"name": "ubi9.1", "commit": {"id": "ccc"}},
+    ]
+
+    with requests_mock.Mocker() as m:
+        m.get(API + "branches", json=branches)
+        tree = m.get(API + "tree", json=[], headers={"X-Total-Pages": "1"})
+
+        loader = _GitlabLoader(
+            "https://some-repo.example.com/foo/bar", versions=["ubi9*"]
+        )
+        assert loader.load_all() == []
+
+    assert [r.qs["ref"] for r in tree.request_history] == [["bbb"], ["ccc"]]
+
+
+def test_load_all_concurrent_keeps_order():
+    branches = [
+        {"name": "ubi7", "commit": {"id": "aaa"}},
+        {"name": "ubi8", "commit": {"id": "bbb"}},
+    ]
+    files = [{"name": "c%s.yaml" % i, "path": "c%s.yaml" % i} for i in range(5)]
+
+    with requests_mock.Mocker() as m:
+        m.get(requests_mock.ANY, text=CONFIG)
+        m.get(API + "branches", json=branches)
+        m.get(API + "tree", json=files, headers={"X-Total-Pages": "1"})
+        # a broken file in the middle must be skipped, not break the others
+        m.get(API + "files/c2.yaml/raw?ref=bbb", text="[oops not yaml")
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        configs = loader.load_all(max_workers=4)
+
+    assert [(c.file_name, c.version) for c in configs] == [
+        ("c0.yaml", "7"),
+        ("c0.yaml", "8"),
+        ("c1.yaml", "7"),
+        ("c1.yaml", "8"),
+        ("c2.yaml", "7"),
+        ("c3.yaml", "7"),
+        ("c3.yaml", "8"),
+        ("c4.yaml", "7"),
+        ("c4.yaml", "8"),
+    ]
+
+
+def test_load_all_pool_size_follows_max_workers():
+    branches = [{"name": "ubi8", "commit": {"id": "aaa"}}]
+
+    with requests_mock.Mocker() as m:
+        m.get(API + "branches", json=branches)
+        m.get(API + "tree", json=[], headers={"X-Total-Pages": "1"})
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        loader.load_all(max_workers=32)
+
+    for prefix in ("https://", "http://"):
+        assert loader.session.get_adapter(prefix)._pool_maxsize == 32
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_iter_all(ordered):
+    branches = [
+        {"name": "ubi7", "commit": {"id": "aaa"}},
+        {"name": "ubi8", "commit": {"id": "bbb"}},
+    ]
+    files = [{"name": "c%s.yaml" % i, "path": "c%s.yaml" % i} for i in range(3)]
+    errors = []
+
+    with requests_mock.Mocker() as m:
+        m.get(requests_mock.ANY, text=CONFIG)
+        m.get(API + "branches", json=branches)
+        m.get(API + "tree", json=files, headers={"X-Total-Pages": "1"})
+        m.get(API + "files/c1.yaml/raw?ref=bbb", text="[oops not yaml")
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        configs = list(
+            loader.iter_all(
+                ordered=ordered,
+                on_error=lambda *args: errors.append(args),
+                max_workers=4,
+            )
+        )
+
+    expected = [
+        ("c0.yaml", "7"),
+        ("c0.yaml", "8"),
+        ("c1.yaml", "7"),
+        ("c2.yaml", "7"),
+        ("c2.yaml", "8"),
+    ]
+    result = [(c.file_name, c.version) for c in configs]
+    assert result == expected if ordered else sorted(result) == expected
+    assert [(f, version) for f, version, _ in errors] == [("c1.yaml", "ubi8")]
+    assert isinstance(errors[0][2], yaml.YAMLError)
+
+
+def test_load_uses_content_cache(tmpdir):
+    branches = [{"name": "ubi7", "commit": {"id": "aaa"}}]
+    files = [{"name": "c.yaml", "path": "c.yaml"}]
+
+    for expected_content_requests in (1, 0):
+        with requests_mock.Mocker() as m:
+            m.get(API + "branches", json=branches)
+            m.get(API + "tree", json=files, headers={"X-Total-Pages": "1"})
+            content = m.get(API + "files/c.yaml/raw?ref=aaa", text=CONFIG)
+
+            loader = _GitlabLoader(
+                "https://some-repo.example.com/foo/bar", cache_dir=str(tmpdir)
+            )
+            configs = loader.load_all()
+
+        assert len(configs) == 1
+        assert content.call_count == expected_content_requests
+
+
+def test_pre_load_keyset_pagination():
+    next_page = API + "tree?ref=aaa&per_page=100&recursive=true&page_token=xyz"
+
+    with requests_mock.Mocker() as m:
+        m.get(API + "branches", json=[{"name": "ubi8", "commit": {"id": "aaa"}}])
+        m.get(
+            API + "tree?pagination=keyset",
+            json=[
+                {"id": "b1", "name": "a.yaml", "path": "a.yaml", "type": "blob"},
+                {"id": "t1", "name": "sub", "path": "sub", "type": "tree"},
+            ],
+            headers={"Link": '<%s>; rel="next"' % next_page},
+        )
+        m.get(
+            next_page,
+            json=[
+                {"id": "b2", "name": "b.yml", "path": "sub/b.yml", "type": "blob"},
+                {"id": "b3", "name": "README", "path": "sub/README", "type": "blob"},
+            ],
+        )
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        files_branch_map = loader._files_branch_map
+
+    assert files_branch_map == {
+        "a.yaml": [("ubi8", "aaa")],
+        "sub/b.yml": [("ubi8", "aaa")],
+    }
+    assert loader._blob_ids == {("aaa", "a.yaml"): "b1", ("aaa", "sub/b.yml"): "b2"}
+
+
+def test_metadata_conditional_requests(tmpdir):
+    branches = [{"name": "ubi8", "commit": {"id": "aaa"}}]
+
+    def branches_callback(request, context):
+        if request.headers.get("If-None-Match") == '"v1"':
+            context.status_code = 304
+            return None
+        context.headers["ETag"] = '"v1"'
+        return branches
+
+    with requests_mock.Mocker() as m:
+        branches_mock = m.get(API + "branches", json=branches_callback)
+
+        loader = _GitlabLoader(
+            "https://some-repo.example.com/foo/bar", cache_dir=str(tmpdir)
+        )
+        assert loader._get_branches() == {"ubi8": "aaa"}
+        # remembered in memory
+        assert loader._get_branches() == {"ubi8": "aaa"}
+
+        # and on disk by a new loader
+        loader = _GitlabLoader(
+            "https://some-repo.example.com/foo/bar", cache_dir=str(tmpdir)
+        )
+        assert loader._get_branches() == {"ubi8": "aaa"}
+
+    assert [r.headers.get("If-None-Match") for r in branches_mock.request_history] == [
+        None,
+        '"v1"',
+        '"v1"',
+    ]
+
+
+def make_archive(files):
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode="w:gz") as archive:
+        for path, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo("bar-aaa-aaa/" + path)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("strategy", ["archive", "auto"])
+def test_load_all_from_archive(strategy):
+    files = [
+        {"name": "a.yaml", "path": "a.yaml"},
+        {"name": "b.yaml", "path": "sub/b.yaml"},
+        {"name": "bad.yaml", "path": "bad.yaml"},
+    ]
+    archive = make_archive(
+        {
+            "a.yaml": CONFIG,
+            "sub/b.yaml": CONFIG,
+            "bad.yaml": "[oops not yaml",
+            "README.md": "not a config",
+        }
+    )
+
+    with requests_mock.Mocker() as m, patch(
+        "ubiconfig._impl.loaders.gitlab.GITLAB_ARCHIVE_THRESHOLD", 3
+    ):
+        raw = m.get(requests_mock.ANY, status_code=500)
+        m.get(API + "branches", json=[{"name": "ubi8", "commit": {"id": "aaa"}}])
+        m.get(API + "tree", json=files)
+        m.get(API + "archive.tar.gz?sha=aaa", content=archive)
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        configs = loader.load_all(strategy=strategy)
+
+    assert [c.file_name for c in configs] == ["a.yaml", "b.yaml"]
+    assert [c.version for c in configs] == ["8", "8"]
+    assert raw.call_count == 0
+
+
+class BrokenStream(io.BytesIO):
+    """An archive body whose connection is reset partway through."""
+
+    def read(self, *args):
+        if self.tell() > 10:
+            raise urllib3.exceptions.ProtocolError("Connection reset by peer")
+        return super(BrokenStream, self).read(*args)
+
+
+def test_load_all_archive_broken_stream():
+    files = [{"name": "a.yaml", "path": "a.yaml"}]
+    body = BrokenStream(make_archive({"a.yaml": CONFIG}))
+
+    with requests_mock.Mocker() as m:
+        raw = m.get(requests_mock.ANY, text=CONFIG)
+        m.get(API + "branches", json=[{"name": "ubi8", "commit": {"id": "aaa"}}])
+        m.get(API + "tree", json=files)
+        m.get(API + "archive.tar.gz?sha=aaa", body=body)
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        configs = loader.load_all(strategy="archive")
+
+    # files are loaded one by one and the archive response is closed
+    assert [c.file_name for c in configs] == ["a.yaml"]
+    assert raw.call_count == 1
+    assert body.closed
+
+
+def test_iter_all_streams_archives():
+    branches = [
+        {"name": "ubi8", "commit": {"id": "aaa"}},
+        {"name": "ubi9", "commit": {"id": "bbb"}},
+    ]
+    files = [{"name": "a.yaml", "path": "a.yaml"}]
+    archive = make_archive({"a.yaml": CONFIG})
+    release = threading.Event()
+    slow_done = threading.Event()
+
+    def slow_archive(request, context):
+        release.wait(5)
+        slow_done.set()
+        return archive
+
+    with requests_mock.Mocker() as m:
+        m.get(API + "branches", json=branches)
+        m.get(API + "tree", json=files)
+        m.get(API + "archive.tar.gz?sha=aaa", content=archive)
+        m.get(API + "archive.tar.gz?sha=bbb", content=slow_archive)
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        configs = loader.iter_all(ordered=False, strategy="archive")
+
+        # configs of the fetched archive come out while the other downloads
+        assert next(configs).version == "8"
+        assert not slow_done.is_set()
+        release.set()
+        assert [c.version for c in configs] == ["9"]
+
+
+def test_load_all_tree_path():
+    files = [{"name": "a.yaml", "path": "configs/a.yaml"}]
+
+    with requests_mock.Mocker() as m:
+        m.get(requests_mock.ANY, text=CONFIG)
+        m.get(API + "branches", json=[{"name": "ubi8", "commit": {"id": "aaa"}}])
+        tree = m.get(API + "tree", json=files)
+
+        loader = ubi.get_loader(
+            "https://some-repo.example.com/foo/bar", tree_path="configs"
+        )
+        configs = loader.load_all(strategy="files")
+
+    assert [c.file_name for c in configs] == ["a.yaml"]
+    assert tree.last_request.qs["path"] == ["configs"]
+
+
+def test_load_all_unknown_strategy():
+    loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+    with pytest.raises(ValueError):
+        loader.load_all(strategy="magic")
+
+
+def test_refresh_loads_only_changed_blobs():
+    def tree(blob_a, blob_b):
+        return [
+            {"id": blob_a, "name": "a.yaml", "path": "a.yaml"},
+            {"id": blob_b, "name": "b.yaml", "path": "b.yaml"},
+        ]
+
+    with requests_mock.Mocker() as m:
+        m.get(API + "branches", json=[{"name": "ubi8", "commit": {"id": "aaa"}}])
+        m.get(API + "tree?ref=aaa", json=tree("a1", "b1"))
+        m.get(API + "files/a.yaml/raw?ref=aaa", text=CONFIG)
+        m.get(API + "files/b.yaml/raw?ref=aaa", text=CONFIG)
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        first = loader.refresh()
+        old_fingerprint = loader.fingerprint()
+        assert [c.file_name for c in first.added] == ["a.yaml", "b.yaml"]
+        assert not loader.refresh()
+        assert loader.fingerprint() == old_fingerprint
+
+        # new commit changes b.yaml only
+        m.get(API + "branches", json=[{"name": "ubi8", "commit": {"id": "bbb"}}])
+        m.get(API + "tree?ref=bbb", json=tree("a1", "b2"))
+        content_b = m.get(API + "files/b.yaml/raw?ref=bbb", text=CONFIG)
+        content_a = m.get(API + "files/a.yaml/raw?ref=bbb", text=CONFIG)
+
+        assert loader.fingerprint() != old_fingerprint
+        changes = loader.refresh()
+
+    assert changes.added == changes.removed == []
+    assert [(old.file_name, new.file_name) for old, new in changes.changed] == [
+        ("b.yaml", "b.yaml")
+    ]
+    assert content_b.call_count == 1
+    assert content_a.call_count == 0
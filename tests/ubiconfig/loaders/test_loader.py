@@ -1,6 +1,10 @@
+import os
+
+import yaml
 from pytest import raises
 
 from ubiconfig import Loader
+from ubiconfig._impl.loaders.base import get_yaml_loader
 
 
 def test_no_load():
@@ -13,3 +17,46 @@ def test_no_load_all():
     """load_all must be implemented in subclass"""
     with raises(NotImplementedError):
         Loader().load_all()
+
+
+def test_no_iter_all():
+    """iter_all must be implemented in subclass"""
+    with raises(NotImplementedError):
+        next(Loader().iter_all())
+
+
+def test_no_refresh():
+    """refresh must be implemented in subclass"""
+    with raises(NotImplementedError):
+        Loader().refresh()
+
+
+def test_no_fingerprint():
+    """fingerprint must be implemented in subclass"""
+    with raises(NotImplementedError):
+        Loader().fingerprint()
+
+
+def test_no_snapshot():
+    """snapshot must be implemented in subclass"""
+    with raises(NotImplementedError):
+        Loader().snapshot("configs.snapshot")
+
+
+def test_yaml_implementations_identical():
+    path = os.path.join(
+        os.path.dirname(__file__), "../../data/configs/ubi7.1/rhel-atomic-host.yaml"
+    )
+    with open(path) as f:
+        content = f.read()
+
+    python_data = yaml.load(content, Loader=get_yaml_loader("python"))
+    auto_data = yaml.load(content, Loader=get_yaml_loader("auto"))
+
+    assert get_yaml_loader("python") is yaml.BaseLoader
+    assert python_data == auto_data
+
+
+def test_yaml_implementation_unknown():
+    with raises(ValueError):
+        get_yaml_loader("fast")
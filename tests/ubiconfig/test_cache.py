@@ -0,0 +1,31 @@
+import os
+
+from ubiconfig._impl.cache import FileCache
+
+
+def test_cache_get_put(tmpdir):
+    cache = FileCache(str(tmpdir))
+    key = FileCache.make_key("repo", "sha1", "file.yaml")
+
+    assert cache.get(key) is None
+    cache.put(key, b"some content")
+
+    assert cache.get(key) == b"some content"
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_cache_eviction(tmpdir):
+    cache = FileCache(str(tmpdir), max_size=25)
+    keys = [FileCache.make_key("repo", str(i)) for i in range(3)]
+
+    cache.put(keys[0], b"0123456789")
+    cache.put(keys[1], b"0123456789")
+    # make the access order explicit
+    os.utime(cache._entry_path(keys[0]), (1000, 1000))
+    os.utime(cache._entry_path(keys[1]), (2000, 2000))
+    cache.put(keys[2], b"0123456789")
+
+    # only two entries fit in the cache, the least recently used one was evicted
+    assert not os.path.exists(cache._entry_path(keys[0]))
+    assert cache.get(keys[1]) == b"0123456789"
+    assert cache.get(keys[2]) == b"0123456789"
@@ -0,0 +1,70 @@
+import io
+import json
+
+from ubiconfig import UbiConfig, export_ndjson, load_ndjson, ubi, validate_config
+
+
+def test_export_dict_round_trip(configs):
+    for config in configs:
+        data = config.export_dict()
+        validate_config(data)
+
+        restored = UbiConfig.load_from_dict(data, config.file_name, config.version)
+
+        assert restored == config
+        assert not config.diff(restored)
+        assert restored.export_dict() == data
+
+
+def test_export_dict():
+    data = {
+        "content_sets": {"rpm": {"input": "in", "output": "out"}},
+        "packages": {"include": ["glibc.i686", "vim"], "exclude": ["kernel*"]},
+        "modules": {
+            "include": [
+                {"name": "nodejs", "stream": 8, "profiles": ["common"]},
+                {"name": "perl", "stream": "5.30"},
+            ]
+        },
+        "flags": {"base_pkgs_only": "true"},
+        "arches": ["i686"],
+    }
+
+    exported = UbiConfig.load_from_dict(data, "config.yaml", "8").export_dict()
+
+    assert exported == {
+        "content_sets": {"rpm": {"input": "in", "output": "out"}},
+        "packages": {"include": ["glibc.i686", "vim"], "exclude": ["kernel*"]},
+        "modules": {
+            "include": [
+                {"name": "nodejs", "stream": "8", "profiles": ["common"]},
+                {"name": "perl", "stream": "5.30"},
+            ]
+        },
+        "flags": {"base_pkgs_only": True},
+        "arches": ["i686"],
+    }
+
+
+def test_ndjson_from_loader(configs, configs_dir):
+    fp = io.StringIO()
+
+    count = export_ndjson(ubi.get_loader(configs_dir), fp)
+
+    lines = fp.getvalue().splitlines()
+    assert count == len(lines) == len(configs)
+    assert [(c.file_name, c.version) for c in configs] == [
+        (line["file_name"], line["version"]) for line in map(json.loads, lines)
+    ]
+
+    fp.seek(0)
+    assert list(load_ndjson(fp)) == configs
+
+
+def test_ndjson_from_configs(configs):
+    fp = io.StringIO()
+
+    assert export_ndjson(iter(configs[:2]), fp) == 2
+
+    fp.seek(0)
+    assert list(load_ndjson(fp)) == configs[:2]
@@ -0,0 +1,45 @@
+import pytest
+
+from ubiconfig import ConfigIndex
+
+
+def test_find(configs):
+    index = ConfigIndex(configs)
+
+    found = index.find(rpm_input="rhel-7-server-rpms")
+    assert sorted((c.file_name, c.version) for c in found) == [
+        ("rhel-7-server.yaml", "7"),
+        ("rhel-7-server.yaml", "7.1"),
+        ("test-config.yaml", "12.13"),
+    ]
+    # the order of the indexed configs is kept
+    assert found == [c for c in configs if c in found]
+
+
+def test_find_multiple_keys(configs):
+    index = ConfigIndex(configs)
+
+    found = index.find(srpm_output="ubi-7-server-source-rpms", version="7.1")
+
+    assert [(c.file_name, c.version) for c in found] == [("rhel-7-server.yaml", "7.1")]
+    assert index.find_one(file_name="rhel-atomic-host.yaml").version == "7.1"
+
+
+def test_find_no_match(configs):
+    index = ConfigIndex(configs)
+
+    assert index.find(rpm_input="rhel-7-server-rpms", version="8") == []
+    assert index.find(file_name="missing.yaml") == []
+    assert index.find_one(debuginfo_output="missing") is None
+
+
+def test_find_all(configs):
+    index = ConfigIndex(configs)
+
+    assert len(index) == len(configs)
+    assert index.find() == list(index) == configs
+
+
+def test_find_unknown_field(configs):
+    with pytest.raises(ValueError):
+        ConfigIndex(configs).find(arch="x86_64")
@@ -0,0 +1,132 @@
+import os
+import struct
+
+import pytest
+import requests_mock
+from mock import patch
+
+from ubiconfig import load_snapshot, ubi
+from ubiconfig._impl.loaders import _GitlabLoader
+from ubiconfig._impl.snapshot import FORMAT_VERSION, MAGIC
+
+
+def test_snapshot_local(tmpdir, configs_dir):
+    path = str(tmpdir.join("configs.snapshot"))
+    loader = ubi.get_loader(configs_dir)
+    loader.snapshot(path)
+
+    with patch("ubiconfig._impl.loaders.local.load_config_dict") as parse:
+        snapshot = load_snapshot(path)
+
+    assert parse.call_count == 0
+    assert snapshot.configs == loader.load_all()
+    assert snapshot.fingerprint == loader.fingerprint()
+    assert snapshot.source == configs_dir
+    for (file_path, _), (mtime, size) in snapshot.sources.items():
+        st = os.stat(file_path)
+        assert (mtime, size) == (st.st_mtime_ns, st.st_size)
+    assert repr(snapshot) == "<Snapshot: 5 configs from %s>" % configs_dir
+
+
+def test_snapshot_gitlab(tmpdir):
+    path = str(tmpdir.join("configs.snapshot"))
+    api = "https://some-repo.example.com/api/v4/projects/foo%2Fbar/repository/"
+    branches = [
+        {"name": "ubi8", "commit": {"id": "aaa"}},
+        {"name": "ubi8.1", "commit": {"id": "bbb"}},
+    ]
+    files = [{"id": "b1", "name": "a.yaml", "path": "a.yaml", "type": "blob"}]
+    config = "content_sets: {}\npackages:\n  include: [vim]\n"
+
+    with requests_mock.Mocker() as m:
+        m.get(requests_mock.ANY, text=config)
+        m.get(api + "branches", json=branches)
+        m.get(api + "tree", json=files, headers={"X-Total-Pages": "1"})
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        loader.snapshot(path)
+        fingerprint = loader.fingerprint()
+
+    # nothing is requested when the snapshot is loaded
+    with requests_mock.Mocker():
+        snapshot = load_snapshot(path)
+
+    assert [(c.file_name, c.version) for c in snapshot.configs] == [
+        ("a.yaml", "8"),
+        ("a.yaml", "8.1"),
+    ]
+    assert snapshot.configs[1].packages.whitelist[0].name == "vim"
+    assert snapshot.sources == {("a.yaml", "ubi8"): "b1", ("a.yaml", "ubi8.1"): "b1"}
+    assert snapshot.fingerprint == fingerprint
+    assert snapshot.source == "https://some-repo.example.com/foo/bar"
+
+
+def test_snapshot_local_fingerprint_of_loaded(tmpdir):
+    configs = tmpdir.mkdir("configs")
+    configs.mkdir("ubi8").join("a.yaml").write(
+        "content_sets: {}\npackages:\n  include: [vim]\n"
+    )
+    path = str(tmpdir.join("configs.snapshot"))
+    loader = ubi.get_loader(str(configs))
+    loader.load_all()
+    fingerprint = loader.fingerprint()
+
+    configs.join("ubi8", "a.yaml").write(
+        "content_sets: {}\npackages:\n  include: [vim, emacs]\n"
+    )
+    loader.snapshot(path)
+
+    # the snapshot has configs which were loaded, so it has their fingerprint
+    snapshot = load_snapshot(path)
+    assert len(snapshot.configs[0].packages.whitelist) == 1
+    assert snapshot.fingerprint == fingerprint
+    assert snapshot.fingerprint != loader.fingerprint()
+
+
+def test_snapshot_gitlab_fingerprint_of_loaded(tmpdir):
+    path = str(tmpdir.join("configs.snapshot"))
+    api = "https://some-repo.example.com/api/v4/projects/foo%2Fbar/repository/"
+    branches = [{"name": "ubi8", "commit": {"id": "aaa"}}]
+    files = [{"id": "b1", "name": "a.yaml", "path": "a.yaml", "type": "blob"}]
+    config = "content_sets: {}\npackages:\n  include: [vim]\n"
+
+    with requests_mock.Mocker() as m:
+        m.get(requests_mock.ANY, text=config)
+        m.get(api + "branches", json=branches)
+        m.get(api + "tree", json=files, headers={"X-Total-Pages": "1"})
+
+        loader = _GitlabLoader("https://some-repo.example.com/foo/bar")
+        loader.load_all()
+        fingerprint = loader.fingerprint()
+
+    # the branch moved after loading, the snapshot requests nothing
+    with requests_mock.Mocker() as m:
+        loader.snapshot(path)
+        assert m.call_count == 0
+
+        m.get(api + "branches", json=[{"name": "ubi8", "commit": {"id": "ccc"}}])
+        assert loader.fingerprint() != fingerprint
+
+    assert load_snapshot(path).fingerprint == fingerprint
+
+
+def test_snapshot_not_a_snapshot(tmpdir):
+    path = tmpdir.join("configs.snapshot")
+    path.write("content_sets: {}\n")
+
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_snapshot_unsupported_version(tmpdir, configs_dir):
+    path = tmpdir.join("configs.snapshot")
+    loader = ubi.get_loader(configs_dir)
+    loader.snapshot(str(path))
+    data = path.read_binary()
+    header = struct.pack("!10sH", MAGIC, FORMAT_VERSION + 1)
+    path.write_binary(header + data[len(header) :])
+
+    with pytest.raises(ValueError) as exc_info:
+        load_snapshot(str(path))
+
+    assert "Unsupported snapshot format version" in str(exc_info.value)
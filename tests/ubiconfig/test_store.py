@@ -0,0 +1,140 @@
+import struct
+from multiprocessing import Pool
+
+import pytest
+
+from ubiconfig import ConfigStore, UbiConfig
+from ubiconfig.store import FORMAT_VERSION, HEADER
+
+
+@pytest.fixture
+def store_path(tmpdir, configs):
+    path = str(tmpdir.join("configs.store"))
+    ConfigStore.write(path, configs)
+    return path
+
+
+def test_store_views(store_path, configs):
+    with ConfigStore.open(store_path) as store:
+        assert len(store) == len(configs)
+        for view, config in zip(store, configs):
+            assert view.file_name == config.file_name
+            assert view.version == config.version
+            assert view.content_sets == config.content_sets
+            assert view.packages.arches == config.packages.arches
+            assert [(p.package, p.name, p.arch) for p in view.packages.whitelist] == [
+                (p.package, p.name, p.arch) for p in config.packages.whitelist
+            ]
+            assert [(p.package, p.name, p.arch) for p in view.packages.blacklist] == [
+                (p.package, p.name, p.arch) for p in config.packages.blacklist
+            ]
+            assert view.modules.whitelist == config.modules.whitelist
+            assert view.flags.as_dict() == config.flags.as_dict()
+            assert view.export_dict() == config.export_dict()
+            assert view.to_config() == config
+            assert repr(view) == config.file_name
+
+
+def test_store_lookups(store_path, configs):
+    config = configs[0]
+    with ConfigStore.open(store_path) as store:
+        view = store[0]
+        assert store[-len(configs)].file_name == view.file_name
+        with pytest.raises(IndexError):
+            store[len(configs)]
+
+        whitelist = view.packages.whitelist
+        assert whitelist[-1].package == config.packages.whitelist[-1].package
+        assert [p.name for p in whitelist[:2]] == [
+            p.name for p in config.packages.whitelist[:2]
+        ]
+
+        names = [p.name for p in config.packages.whitelist]
+        names += [p.name for p in config.packages.blacklist] + ["unknown"]
+        assert list(view.packages.masks(names)) == list(config.packages.masks(names))
+
+        for module in config.modules.whitelist:
+            assert view.modules.contains(module.name, module.stream)
+            assert view.modules.streams_for(module.name) == (
+                config.modules.streams_for(module.name)
+            )
+        assert not view.modules.contains("unknown", "1")
+
+        for flag in config.flags:
+            assert getattr(view.flags, flag.name) == flag
+        assert view.flags.unknown is None
+
+
+def test_store_from_buffer():
+    config = UbiConfig.load_from_dict(
+        {
+            "content_sets": {"rpm": {"input": "in", "output": "out"}},
+            "packages": {"include": ["vim.x86_64", "glibc"], "exclude": []},
+            "modules": {
+                "include": [
+                    {"name": "nodejs", "stream": "8", "profiles": []},
+                    {"name": "perl", "stream": "5.30"},
+                ]
+            },
+            "flags": {"base_pkgs_only": True, "other": "ţ"},
+            "arches": ["x86_64"],
+        },
+        "cfg.yaml",
+        None,
+    )
+    store = ConfigStore(ConfigStore.pack([config]))
+
+    view = store[0]
+    assert view.version is None
+    assert view.content_sets.srpm.input == config.content_sets.srpm.input
+    assert view.packages.whitelist[0].arch == "x86_64"
+    assert view.packages.whitelist[1].arch is None
+    assert view.modules[0].profiles == []
+    assert view.modules[1].profiles is None
+    assert view.flags.base_pkgs_only.value is True
+    assert view.flags.other.value == "ţ"
+    assert view.to_config() == config
+    store.close()
+
+
+def test_store_shared_memory(configs):
+    shared_memory = pytest.importorskip("multiprocessing.shared_memory")
+    data = ConfigStore.pack(configs)
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[: len(data)] = data
+        store = ConfigStore(shm.buf)
+        assert [view.to_config() for view in store] == configs
+        store.close()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _file_names(path):
+    with ConfigStore.open(path) as store:
+        return [view.file_name for view in store]
+
+
+def test_store_workers(store_path, configs):
+    with Pool(2) as pool:
+        results = pool.map(_file_names, [store_path] * 2)
+
+    assert results == [[c.file_name for c in configs]] * 2
+
+
+def test_store_invalid(tmpdir, configs):
+    with pytest.raises(ValueError):
+        ConfigStore(b"content_sets: {}\n" * 4)
+
+    data = ConfigStore.pack(configs)
+    magic = data[:12]
+    header = struct.pack("=12sH", magic, FORMAT_VERSION + 1)
+    with pytest.raises(ValueError) as exc_info:
+        ConfigStore(header + data[len(header) :])
+    assert "Unsupported store format version" in str(exc_info.value)
+
+    path = tmpdir.join("configs.store")
+    path.write_binary(data[: HEADER.size - 1])
+    with pytest.raises(ValueError):
+        ConfigStore.open(str(path))
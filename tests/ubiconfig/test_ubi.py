@@ -12,15 +12,17 @@ import yaml
 from jsonschema.exceptions import ValidationError
 from mock import patch
 
-from ubiconfig import UbiConfig, ubi
+from ubiconfig import UbiConfig, diff_configs, ubi
+from ubiconfig._impl.loaders import local
 
 TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), "../data")
 ubi.DEFAULT_UBI_REPO = "https://contentdelivery.com/ubi/data"
 
 
 class FakeResponse:
-    def __init__(self, content):
+    def __init__(self, content, status_code=200):
         self.content = content
+        self.status_code = status_code
 
     def raise_for_status(self):
         # currently it's not demanded.
@@ -230,6 +232,11 @@ def test_load_all_from_local():
     assert isinstance(configs[0], UbiConfig)
 
 
+def test_local_loader_tree_path(tmpdir):
+    with pytest.raises(ubi.LoaderError):
+        ubi.get_loader(str(tmpdir), tree_path="configs")
+
+
 def test_load_from_directory_not_named_after_ubi():
     with patch("os.path.isdir"):
         loader = ubi.get_loader("./ubi7.1a")
@@ -267,24 +274,24 @@ def test_load_file_non_exists_from_remote(
     mocked_get_branches.return_value = branches
     mocked_pre_load.return_value = files_branch_map
 
+    loader = ubi.get_loader()
+    # once the files are discovered, missing files are rejected without requests
+    assert "rhel-7-server.yaml" in loader._files_branch_map
     with pytest.raises(ValueError):
-        ubi.get_loader().load("non-exists.yaml", "ubi7")
+        loader.load("non-exists.yaml", "ubi7")
+    assert mocked_session.return_value.request.call_count == 0
 
 
 @patch("requests.Session")
-@patch("ubiconfig._impl.loaders._GitlabLoader._pre_load")
-@patch("ubiconfig._impl.loaders._GitlabLoader._get_branches")
+@patch("ubiconfig._impl.loaders._GitlabLoader._get_branch_sha1")
 def test_load_file_without_providing_version(
-    mocked_get_branches,
-    mocked_pre_load,
+    mocked_get_branch_sha1,
     mocked_session,
     branches,
-    files_branch_map,
     ubi7_config_file,
     response,
 ):
-    mocked_get_branches.return_value = branches
-    mocked_pre_load.return_value = files_branch_map
+    mocked_get_branch_sha1.side_effect = branches.get
     mocked_session.return_value.request.side_effect = [response(ubi7_config_file)]
 
     with pytest.raises(ValueError):
@@ -292,20 +299,16 @@ def test_load_file_without_providing_version(
 
 
 @patch("requests.Session")
-@patch("ubiconfig._impl.loaders._GitlabLoader._pre_load")
-@patch("ubiconfig._impl.loaders._GitlabLoader._get_branches")
+@patch("ubiconfig._impl.loaders._GitlabLoader._get_branch_sha1")
 def test_load_file_with_wanted_version(
-    mocked_get_branches,
-    mocked_pre_load,
+    mocked_get_branch_sha1,
     mocked_session,
     branches,
-    files_branch_map,
     ubi7_config_file,
     ubi8_config_file,
     response,
 ):
-    mocked_get_branches.return_value = branches
-    mocked_pre_load.return_value = files_branch_map
+    mocked_get_branch_sha1.side_effect = branches.get
     mocked_session.return_value.request.side_effect = [
         response(ubi7_config_file),
         response(ubi8_config_file),
@@ -320,19 +323,15 @@ def test_load_file_with_wanted_version(
 
 
 @patch("requests.Session")
-@patch("ubiconfig._impl.loaders._GitlabLoader._pre_load")
-@patch("ubiconfig._impl.loaders._GitlabLoader._get_branches")
+@patch("ubiconfig._impl.loaders._GitlabLoader._get_branch_sha1")
 def test_load_file_with_non_exists_version(
-    mocked_get_branches,
-    mocked_pre_load,
+    mocked_get_branch_sha1,
     mocked_session,
     branches,
-    files_branch_map,
     ubi8_config_file,
     response,
 ):
-    mocked_get_branches.return_value = branches
-    mocked_pre_load.return_value = files_branch_map
+    mocked_get_branch_sha1.side_effect = branches.get
     mocked_session.return_value.request.side_effect = [response(ubi8_config_file)]
 
     loader = ubi.get_loader()
@@ -342,19 +341,15 @@ def test_load_file_with_non_exists_version(
 
 
 @patch("requests.Session")
-@patch("ubiconfig._impl.loaders._GitlabLoader._pre_load")
-@patch("ubiconfig._impl.loaders._GitlabLoader._get_branches")
+@patch("ubiconfig._impl.loaders._GitlabLoader._get_branch_sha1")
 def test_load_file_failed_fallback_to_default(
-    mocked_get_branches,
-    mocked_pre_load,
+    mocked_get_branch_sha1,
     mocked_session,
     branches,
-    files_branch_map,
     ubi8_config_file,
     response,
 ):
-    mocked_get_branches.return_value = branches
-    mocked_pre_load.return_value = files_branch_map
+    mocked_get_branch_sha1.side_effect = branches.get
     mocked_session.return_value.request.side_effect = [response(ubi8_config_file)]
 
     with pytest.raises(ValueError):
@@ -394,7 +389,7 @@ def test_get_empty_branches(mocked_session):
         ("Please check https://contentdelivery.com/ubi/data " "is in right format")
     )
     try:
-        ubi.get_loader()
+        ubi.get_loader().load_all()
         raise AssertionError("test should fail!")
     except RuntimeError as actual_exception:
         assert actual_exception.args == exception.args
@@ -511,3 +506,265 @@ def test_ubi_config(ubi7_1_config_file1):
     assert str(config.packages.blacklist[0]) == "<Package: kernel*>"
     assert config.version == "7.1"
     assert config.flags.base_pkgs_only.value is False
+
+
+def test_refresh_local(tmpdir, ubi8_config_file):
+    ubi8 = tmpdir.mkdir("ubi8")
+    content = ubi8_config_file.read()
+    ubi8.join("a.yaml").write(content)
+    ubi8.join("b.yaml").write(content)
+
+    loader = ubi.get_loader(str(tmpdir))
+    assert len(loader.load_all()) == 2
+    old_fingerprint = loader.fingerprint()
+    assert not loader.refresh()
+    assert loader.fingerprint() == old_fingerprint
+
+    ubi8.join("b.yaml").write(content + "\n")
+    ubi8.join("a.yaml").remove()
+    ubi8.join("c.yaml").write(content)
+
+    assert loader.fingerprint() != old_fingerprint
+    changes = loader.refresh()
+    assert [c.file_name for c in changes.added] == ["c.yaml"]
+    assert [c.file_name for c in changes.removed] == ["a.yaml"]
+    assert [new.file_name for _, new in changes.changed] == ["b.yaml"]
+
+
+def test_load_all_from_local_with_workers(caplog):
+    loader = ubi.get_loader(TEST_DATA_DIR)
+    expected = [(c.file_name, c.version) for c in loader.load_all()]
+
+    configs = loader.load_all(workers=2)
+
+    assert [(c.file_name, c.version) for c in configs] == expected
+    assert len(configs) == 5
+    assert "invalid_config.yaml FAILED schema validation" in caplog.text
+    assert "syntax_error.yaml FAILED loading because of Syntax error" in caplog.text
+    assert configs[0].flags.as_dict() == loader.load_all()[0].flags.as_dict()
+
+
+def test_load_all_from_local_with_cache(tmpdir):
+    cache_dir = str(tmpdir.mkdir("cache"))
+    repo = os.path.join(TEST_DATA_DIR, "configs")
+    expected = [
+        (c.file_name, c.version, c.packages.whitelist[0].name)
+        for c in ubi.get_loader(repo).load_all()
+    ]
+
+    # populate the cache, also from worker processes
+    ubi.get_loader(repo, cache_dir=cache_dir).load_all(workers=2)
+
+    with patch("ubiconfig._impl.loaders.local.load_config_dict") as parse:
+        configs = ubi.get_loader(repo, cache_dir=cache_dir).load_all()
+
+    assert parse.call_count == 0
+    assert [
+        (c.file_name, c.version, c.packages.whitelist[0].name) for c in configs
+    ] == expected
+
+
+def test_load_from_local_cache_invalidated(tmpdir, ubi8_config_file):
+    cache_dir = str(tmpdir.mkdir("cache"))
+    config_file = tmpdir.mkdir("ubi8").join("config.yaml")
+    content = ubi8_config_file.read()
+    config_file.write(content)
+
+    loader = ubi.get_loader(str(tmpdir), cache_dir=cache_dir)
+    assert loader.load("ubi8/config.yaml").flags.base_pkgs_only is None
+
+    config_file.write(content + "flags:\n  base_pkgs_only: true\n")
+    assert loader.load("ubi8/config.yaml").flags.base_pkgs_only.value is True
+
+
+def test_load_from_local_cache_schema_changed(tmpdir):
+    cache_dir = str(tmpdir.mkdir("cache"))
+    repo = os.path.join(TEST_DATA_DIR, "configs")
+    ubi.get_loader(repo, cache_dir=cache_dir).load("ubi8/rhel-8-for-power-le.yaml")
+
+    with patch(
+        "ubiconfig._impl.loaders.local._schema_digest", return_value="new-schema"
+    ):
+        with patch(
+            "ubiconfig._impl.loaders.local.load_config_dict",
+            wraps=local.load_config_dict,
+        ) as parse:
+            loader = ubi.get_loader(repo, cache_dir=cache_dir)
+            loader.load("ubi8/rhel-8-for-power-le.yaml")
+
+    assert parse.call_count == 1
+
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_watch_local(tmpdir, use_inotify, ubi8_config_file):
+    if use_inotify:
+        pytest.importorskip("inotify_simple")
+    content = ubi8_config_file.read()
+    ubi8 = tmpdir.mkdir("ubi8")
+    ubi8.join("a.yaml").write(content)
+
+    loader = ubi.get_loader(str(tmpdir))
+    events = loader.watch(interval=0.01, use_inotify=use_inotify)
+
+    ubi8.join("b.yaml").write(content)
+    event = next(events)
+    assert (event.kind, event.path) == ("updated", str(ubi8.join("b.yaml")))
+    assert event.config.version == "8"
+
+    ubi8.join("a.yaml").write(content + "\n")
+    event = next(events)
+    assert (event.kind, event.path) == ("updated", str(ubi8.join("a.yaml")))
+
+    ubi8.join("a.yaml").remove()
+    event = next(events)
+    assert (event.kind, event.path, event.config) == (
+        "removed",
+        str(ubi8.join("a.yaml")),
+        None,
+    )
+
+    tmpdir.mkdir("ubi9").join("c.yaml").write(content)
+    event = next(events)
+    assert (event.kind, event.version) == ("updated", "ubi9")
+    assert event.config.file_name == "c.yaml"
+
+    events.close()
+    assert loader._ver_files_map == {
+        "ubi8": [str(ubi8.join("b.yaml"))],
+        "ubi9": [str(tmpdir.join("ubi9", "c.yaml"))],
+    }
+
+
+def test_watch_local_inotify_is_lazy(tmpdir, ubi8_config_file):
+    pytest.importorskip("inotify_simple")
+    tmpdir.mkdir("ubi8").join("a.yaml").write(ubi8_config_file.read())
+    loader = ubi.get_loader(str(tmpdir))
+
+    with patch("ubiconfig._impl.loaders.local.inotify_simple.INotify") as inotify:
+        # fail when inotify is read for the first time
+        inotify.return_value.read.side_effect = OSError("read failed")
+        events = loader.watch(interval=0.01, use_inotify=True)
+        # a generator which is never iterated doesn't open inotify
+        assert inotify.call_count == 0
+
+        with pytest.raises(OSError):
+            next(events)
+
+    assert inotify.call_count == 1
+    assert inotify.return_value.close.call_count == 1
+
+
+def test_local_discovery_is_lazy():
+    with patch("ubiconfig._impl.loaders.local.os.scandir") as scandir:
+        loader = ubi.get_loader(TEST_DATA_DIR)
+        config = loader.load("configs/ubi7.1/rhel-atomic-host.yaml")
+
+    assert config.version == "7.1"
+    assert scandir.call_count == 0
+
+
+@pytest.mark.parametrize(
+    "versions, expected",
+    [
+        (None, ["ubi8/a.yaml", "ubi9.1/c.yaml", "ubi9/b.yaml"]),
+        (["ubi9*"], ["ubi9.1/c.yaml", "ubi9/b.yaml"]),
+        (["ubi9"], ["ubi9/b.yaml"]),
+    ],
+)
+def test_local_discovery_prunes_dirs(tmpdir, versions, expected, ubi8_config_file):
+    content = ubi8_config_file.read()
+    tmpdir.mkdir("ubi8").join("a.yaml").write(content)
+    tmpdir.mkdir("configs").mkdir("ubi9").join("b.yaml").write(content)
+    tmpdir.join("configs").mkdir("ubi9.1").join("c.yaml").write(content)
+    # hidden and non-version directories are not loaded
+    tmpdir.mkdir(".git").mkdir("ubi8").join("x.yaml").write(content)
+    tmpdir.mkdir("docs").join("y.yaml").write(content)
+
+    loader = ubi.get_loader(str(tmpdir), versions=versions)
+    configs = loader.load_all()
+
+    assert (
+        sorted(
+            "%s/%s" % (os.path.basename(os.path.dirname(f)), os.path.basename(f))
+            for files in loader._ver_files_map.values()
+            for f in files
+        )
+        == expected
+    )
+    assert len(configs) == len(expected)
+
+
+@pytest.mark.parametrize("ordered, workers", [(True, None), (False, 2)])
+def test_iter_all_from_local(ordered, workers):
+    loader = ubi.get_loader(TEST_DATA_DIR)
+    expected = [(c.file_name, c.version) for c in loader.load_all()]
+    errors = []
+
+    configs = loader.iter_all(
+        ordered=ordered,
+        on_error=lambda *args: errors.append(args),
+        workers=workers,
+    )
+    result = [(c.file_name, c.version) for c in configs]
+
+    assert result == expected if ordered else sorted(result) == sorted(expected)
+    errors = sorted((os.path.basename(f), version, e) for f, version, e in errors)
+    assert [(f, version) for f, version, _ in errors] == [
+        ("invalid_config.yaml", "ubi7"),
+        ("syntax_error.yaml", "ubi7"),
+    ]
+    invalid, syntax = errors[0][2], errors[1][2]
+    assert isinstance(invalid, ValidationError)
+    assert isinstance(syntax, yaml.YAMLError)
+    if not workers:
+        # errors of files loaded in process are passed as they were raised
+        assert invalid.validator
+        assert syntax.problem_mark
+
+
+def test_load_all_from_local_interned(tmpdir, ubi8_config_file):
+    content = ubi8_config_file.read()
+    for version in ("ubi8", "ubi8.1", "ubi8.2"):
+        tmpdir.mkdir(version).join("config.yaml").write(content)
+
+    configs = ubi.get_loader(str(tmpdir)).load_all(intern=True)
+
+    assert sorted(c.version for c in configs) == ["8", "8.1", "8.2"]
+    assert len(set(id(c.packages) for c in configs)) == 1
+    assert len(set(id(c.modules) for c in configs)) == 1
+
+    configs = ubi.get_loader(str(tmpdir)).load_all()
+    assert len(set(id(c.packages) for c in configs)) == 3
+
+    # options of load_all are keyword-only
+    with pytest.raises(TypeError):
+        ubi.get_loader(str(tmpdir)).load_all(True)
+
+
+def test_diff_configs_between_versions():
+    configs = ubi.get_loader(os.path.join(TEST_DATA_DIR, "configs")).load_all()
+    ubi7 = [c for c in configs if c.version == "7"]
+    ubi71 = [c for c in configs if c.version == "7.1"]
+
+    assert not diff_configs(ubi7, ubi7)
+
+    # equal content of another version isn't a change
+    changes = diff_configs(ubi7, ubi71, key=lambda c: c.file_name)
+    assert [c.file_name for c in changes.added] == ["rhel-atomic-host.yaml"]
+    assert changes.removed == []
+    assert changes.changed == []
+
+    i = [c.file_name for c in ubi71].index("rhel-7-server.yaml")
+    data = ubi71[i].export_dict()
+    data["packages"]["include"].append("new-package")
+    ubi71[i] = UbiConfig.load_from_dict(data, "rhel-7-server.yaml", "7.1")
+    changes = diff_configs(ubi7, ubi71, key=lambda c: c.file_name)
+    assert [(old.version, new.version) for old, new in changes.changed] == [
+        ("7", "7.1")
+    ]
+    _, _, diff = changes.diffs()[0]
+    assert [p.name for p in diff.packages.added] == ["new-package"]
+
+    # matched by default by file name and version
+    changes = diff_configs(ubi7, ubi71)
+    assert len(changes.added) == 2 and len(changes.removed) == 1
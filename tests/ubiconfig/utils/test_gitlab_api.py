@@ -24,9 +24,30 @@ def test_get_branch_list_api(v4_repo_api, v4_api_prefix):
     assert v4_repo_api.get_branch_list_api() == expected_branch_api
 
 
+def test_get_branch_api(v4_repo_api, v4_api_prefix):
+    expected_branch_api = urljoin(v4_api_prefix, "repository/branches/feature%2Fx")
+    assert v4_repo_api.get_branch_api("feature/x") == expected_branch_api
+
+
 def test_get_file_list_api(v4_repo_api, v4_api_prefix):
-    expected_file_list_api = urljoin(v4_api_prefix, "repository/tree?ref=master&page=1")
-    v4_repo_api.get_file_list_api(page=1) == expected_file_list_api
+    expected_file_list_api = urljoin(
+        v4_api_prefix, "repository/tree?ref=master&per_page=100&recursive=true&page=1"
+    )
+    assert v4_repo_api.get_file_list_api(page=1) == expected_file_list_api
+
+
+def test_get_file_list_api_keyset_with_path(v4_repo_api, v4_api_prefix):
+    expected_file_list_api = urljoin(
+        v4_api_prefix,
+        "repository/tree?ref=abc&per_page=100&recursive=true&path=configs%2Fubi8"
+        "&pagination=keyset",
+    )
+    assert (
+        v4_repo_api.get_file_list_api(
+            page=1, branch="abc", path="configs/ubi8", keyset=True
+        )
+        == expected_file_list_api
+    )
 
 
 def test_file_content_api(v4_repo_api, v4_api_prefix):
@@ -37,6 +58,13 @@ def test_file_content_api(v4_repo_api, v4_api_prefix):
     assert v4_repo_api.get_file_content_api(file_path) == expected_file_content_api
 
 
+def test_archive_api(v4_repo_api, v4_api_prefix):
+    expected_archive_api = urljoin(
+        v4_api_prefix, "repository/archive.tar.gz?sha=abc&path=configs"
+    )
+    assert v4_repo_api.get_archive_api("abc", "configs") == expected_archive_api
+
+
 def test_gitlab_api_v3():
     repo_api = gitlab.RepoApi("https://test-host.com/ubi/data", v_3=True)
     assert repo_api.api_url == "https://test-host.com/api/v3/projects/ubi%2Fdata/"
@@ -61,3 +61,22 @@ def test_validate_failed_unsupported_flag(ubi7_1_config):
     ubi7_1_config["flags"] = {"unsupported-flag": True}
     with pytest.raises(ValidationError):
         config_validation.validate_config(ubi7_1_config)
+
+
+def test_get_validator_is_cached():
+    assert config_validation.get_validator() is config_validation.get_validator()
+
+
+def test_get_validator_custom_schema(ubi7_1_config):
+    schema = {"type": "object", "required": ["content_sets"]}
+    validator = config_validation.get_validator(schema)
+
+    assert config_validation.get_validator(dict(schema)) is validator
+    assert validator.is_valid(ubi7_1_config)
+
+    # the cached validator is not affected by changes of the given schema
+    schema["required"] = ["other"]
+    assert config_validation.get_validator(schema) is not validator
+    assert validator.is_valid(ubi7_1_config)
+    with pytest.raises(ValidationError):
+        config_validation.validate_config(ubi7_1_config, schema)
@@ -1,6 +1,22 @@
-from ubiconfig._impl.loaders.base import Loader
+from ubiconfig._impl.loaders.base import Loader, diff_configs
+from ubiconfig._impl.snapshot import load_snapshot
 from ubiconfig.config_types import UbiConfig
+from ubiconfig.export import export_ndjson, load_ndjson
+from ubiconfig.index import ConfigIndex
+from ubiconfig.store import ConfigStore
 from ubiconfig.ubi import get_loader
-from ubiconfig.utils.config_validation import validate_config
+from ubiconfig.utils.config_validation import get_validator, validate_config
 
-__all__ = ["get_loader", "Loader", "UbiConfig", "validate_config"]
+__all__ = [
+    "ConfigIndex",
+    "ConfigStore",
+    "diff_configs",
+    "export_ndjson",
+    "get_loader",
+    "get_validator",
+    "load_ndjson",
+    "load_snapshot",
+    "Loader",
+    "UbiConfig",
+    "validate_config",
+]
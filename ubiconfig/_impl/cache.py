@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import threading
+
+from .files import _atomic_write
+
+LOG = logging.getLogger("ubiconfig")
+
+CACHE_DIR = os.getenv("UBICONFIG_CACHE_DIR", "")
+CACHE_MAX_SIZE = int(os.getenv("UBICONFIG_CACHE_MAX_SIZE", str(256 * 1024 * 1024)))
+CACHE_VERIFY_HASH = os.getenv("UBICONFIG_CACHE_VERIFY_HASH", "0") == "1"
+
+
+class FileCache(object):
+    """A content-addressed cache of raw bytes stored in a local directory.
+
+    Entries are written atomically (to a temporary file which is then renamed)
+    so concurrent readers never see partial data. When the total size of the
+    cache grows over ``max_size`` bytes, the least recently used entries are
+    removed.
+    """
+
+    def __init__(self, path, max_size=CACHE_MAX_SIZE):
+        """
+        Args:
+            path (str): directory where cached entries are stored
+            max_size (int): maximum size of all entries in bytes
+        """
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None
+        os.makedirs(self.path, exist_ok=True)
+
+    def __reduce__(self):
+        # the lock can't be pickled, workers get a fresh instance
+        return (self.__class__, (self.path, self.max_size))
+
+    @staticmethod
+    def make_key(*parts):
+        """Return a cache key for the given identifying parts."""
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def __contains__(self, key):
+        return os.path.exists(self._entry_path(key))
+
+    def get(self, key):
+        """Return cached bytes for the key or None if it's not cached."""
+        entry = self._entry_path(key)
+        try:
+            with open(entry, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # bump access time for LRU eviction
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store bytes under the key, evicting old entries if needed."""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        try:
+            _atomic_write(entry, [data])
+        except OSError:
+            LOG.warning("Cannot write cache entry %s", entry, exc_info=True)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._evict()
+            else:
+                self._size += len(data)
+                if self._size > self.max_size:
+                    self._size = self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries over the size limit.
+
+        Returns the size of the cache after eviction.
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                entry = os.path.join(root, name)
+                try:
+                    st = os.stat(entry)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry))
+                total += st.st_size
+
+        if total <= self.max_size:
+            return total
+
+        for _, size, entry in sorted(entries):
+            try:
+                os.unlink(entry)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_size:
+                break
+
+        return total
+
+    def stats(self):
+        """Return a {"hits": int, "misses": int} dictionary."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+
+def _atomic_write(path, chunks):
+    """Write chunks of bytes to a file atomically.
+
+    The chunks are written to a temporary file in the same directory which is
+    then renamed, so readers never see a partial file. The temporary file is
+    removed if writing fails.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
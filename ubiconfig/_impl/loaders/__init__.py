@@ -1,4 +1,5 @@
 from .gitlab import GitlabLoader as _GitlabLoader
+from .gitlab_async import AsyncGitlabLoader as _AsyncGitlabLoader
 from .local import LocalLoader as _LocalLoader
 
-__all__ = ["_GitlabLoader", "_LocalLoader"]
+__all__ = ["_AsyncGitlabLoader", "_GitlabLoader", "_LocalLoader"]
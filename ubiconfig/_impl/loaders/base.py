@@ -1,9 +1,73 @@
+import hashlib
+import os
 import re
 
+import yaml
+
+from ubiconfig.config_types import UbiConfig
+from ubiconfig.config_types.interner import Interner
+from ubiconfig.utils.config_validation import validate_config
+
 PREFIX_VERSION_RE = re.compile(
     r"^(?P<prefix>[A-Za-z_-]{1,25})(?P<default_version>[\d]{1,2})(\.(?P<minor_version>[\d]{1,2}))?$"
 )
 
+YAML_IMPLEMENTATION = os.getenv("UBICONFIG_YAML_LOADER", "auto")
+
+YAML_IMPLEMENTATIONS = ("auto", "c", "python")
+
+
+def get_yaml_loader(implementation=None):
+    """Return the PyYAML loader class used to parse config files.
+
+    ``implementation`` (defaults to ``UBICONFIG_YAML_LOADER``) is one of:
+
+    - ``auto``: ``yaml.CBaseLoader`` if PyYAML was built with libyaml,
+      ``yaml.BaseLoader`` otherwise
+    - ``c``: ``yaml.CBaseLoader``, an error is raised if it's not available
+    - ``python``: pure python ``yaml.BaseLoader``
+
+    Both loaders produce identical data.
+    """
+    implementation = implementation or YAML_IMPLEMENTATION
+    if implementation not in YAML_IMPLEMENTATIONS:
+        raise ValueError(
+            "Unknown YAML implementation %s, expected one of %s"
+            % (implementation, ", ".join(YAML_IMPLEMENTATIONS))
+        )
+
+    c_loader = getattr(yaml, "CBaseLoader", None)
+    if implementation == "python":
+        return yaml.BaseLoader
+    if implementation == "c" and c_loader is None:
+        raise RuntimeError("PyYAML was built without libyaml support")
+
+    return c_loader or yaml.BaseLoader
+
+
+def load_config_dict(content, yaml_implementation=None):
+    """Parse and validate the content of a config file.
+
+    ``content`` may be a string, bytes or a file object.
+    Return the validated dictionary.
+    """
+    config_dict = yaml.load(content, Loader=get_yaml_loader(yaml_implementation))
+    # validate input data
+    validate_config(config_dict)
+
+    return config_dict
+
+
+def parse_config(content, file_name, version, yaml_implementation=None):
+    """Parse and validate the content of a config file.
+
+    ``content`` may be a string, bytes or a file object.
+    Return a :class:`UbiConfig` object.
+    """
+    config_dict = load_config_dict(content, yaml_implementation)
+
+    return UbiConfig.load_from_dict(config_dict, file_name, version)
+
 
 class Loader(object):
     """Load UBI configuration.
@@ -28,8 +92,173 @@ class Loader(object):
         """
         raise NotImplementedError()
 
-    def load_all(self):
+    def load_all(self, *, intern=False):
         """Get the list of config files from repo and call load on every file.
         Return a list of :class:`UbiConfig` objects.
+
+        If ``intern`` is True, equal strings and equal package and module
+        lists are shared by the returned configs, which saves a lot of memory
+        when many versions are loaded. An
+        :class:`~ubiconfig.config_types.interner.Interner` can be passed
+        instead to share them also with configs loaded before.
+        """
+        raise NotImplementedError()
+
+    def iter_all(self, ordered=True, on_error=None):
+        """Like :meth:`load_all`, but yield :class:`UbiConfig` objects as soon as
+        they're loaded, so they can be processed while other files are still
+        being fetched and parsed.
+
+        If ``ordered`` is True, configs are yielded in the same order as
+        returned by :meth:`load_all`, otherwise in order of completion.
+
+        Files which fail to load are skipped. If ``on_error`` is given, it's
+        called as ``on_error(file_name, version, exception)`` for each of them
+        instead of logging the error.
+        """
+        raise NotImplementedError()
+
+    def refresh(self):
+        """Pick up changes of the config source since the last call of
+        :meth:`load_all` or :meth:`refresh`.
+
+        Only config files whose source changed are loaded again.
+        Return a :class:`ConfigChanges` object describing added, removed and
+        changed :class:`UbiConfig` objects. On the first call, all configs are
+        reported as added.
+        """
+        raise NotImplementedError()
+
+    def fingerprint(self):
+        """Return a string which changes whenever the config source changes.
+
+        It's much cheaper than loading the configs, so it can be used to skip
+        :meth:`refresh` when nothing changed.
         """
         raise NotImplementedError()
+
+    def snapshot(self, path):
+        """Write all loaded configs, their sources and the fingerprint of the
+        loader to a snapshot file, which can be restored quickly by
+        :func:`~ubiconfig.load_snapshot`.
+
+        Configs of the last :meth:`load_all` or :meth:`refresh` are written,
+        :meth:`load_all` is called if there was none.
+        """
+        raise NotImplementedError()
+
+
+class ConfigChanges(object):
+    """Changes of loaded configs returned by :meth:`Loader.refresh`."""
+
+    def __init__(self, added, removed, changed):
+        """
+        Args:
+            added(list): newly loaded :class:`UbiConfig` objects
+            removed(list): :class:`UbiConfig` objects which no longer exist
+            changed(list): ``(old, new)`` tuples of :class:`UbiConfig` objects
+        """
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return "<ConfigChanges: %s added, %s removed, %s changed>" % (
+            len(self.added),
+            len(self.removed),
+            len(self.changed),
+        )
+
+    def diffs(self):
+        """Return a list of ``(old, new, diff)`` tuples for changed configs,
+        where diff is a :class:`~ubiconfig.config_types.diff.ConfigDiff`.
+        """
+        return [(old, new, old.diff(new)) for old, new in self.changed]
+
+    @classmethod
+    def from_loaded(cls, previous, current):
+        """Create :class:`ConfigChanges` from two ``{key: (source, config)}``
+        mappings of loaded configs, as kept by the loaders.
+        """
+        added = [config for key, (_, config) in current.items() if key not in previous]
+        removed = [
+            config for key, (_, config) in previous.items() if key not in current
+        ]
+        changed = [
+            (previous[key][1], config)
+            for key, (source, config) in current.items()
+            if key in previous and previous[key][0] != source
+        ]
+        return cls(added, removed, changed)
+
+
+def diff_configs(old, new, key=None):
+    """Compare two lists of :class:`UbiConfig` objects, e.g. results of
+    :meth:`Loader.load_all`.
+
+    Configs are matched by ``key``, a function returning a hashable identifier
+    of a config, by default ``(file_name, version)``. To compare configs of
+    two versions, use e.g. ``key=lambda config: config.file_name``.
+
+    Return a :class:`ConfigChanges` object, only configs whose content sets,
+    packages, modules or flags differ are reported as changed; see
+    :meth:`ConfigChanges.diffs`.
+    """
+    key = key or (lambda config: (config.file_name, config.version))
+    old_map = dict((key(config), config) for config in old)
+    new_map = dict((key(config), config) for config in new)
+
+    return ConfigChanges(
+        added=[config for k, config in new_map.items() if k not in old_map],
+        removed=[config for k, config in old_map.items() if k not in new_map],
+        changed=[
+            (old_map[k], config)
+            for k, config in new_map.items()
+            if k in old_map and _content(old_map[k]) != _content(config)
+        ],
+    )
+
+
+def _content(config):
+    # file name and version identify the config, they aren't its content
+    return (config.content_sets, config.packages, config.modules, config.flags)
+
+
+def intern_configs(configs, intern=False):
+    """Share equal parts of the configs if ``intern`` is True or an
+    :class:`~ubiconfig.config_types.interner.Interner`, return the configs.
+    """
+    if not intern:
+        return configs
+    interner = intern if isinstance(intern, Interner) else Interner()
+    return [interner.config(config) for config in configs]
+
+
+def ordered_results(results, ordered=True):
+    """Yield ``(index, result)`` pairs from an iterable of such pairs, which
+    come in order of completion.
+
+    If ``ordered`` is True, results are held back until all results with
+    a lower index were yielded. Indexes must be consecutive integers from 0.
+    """
+    pending = {}
+    next_index = 0
+    for index, result in results:
+        if not ordered:
+            yield index, result
+            continue
+        pending[index] = result
+        while next_index in pending:
+            yield next_index, pending.pop(next_index)
+            next_index += 1
+
+
+def fingerprint(items):
+    """Return a hex digest of the given (name, state) pairs."""
+    digest = hashlib.sha256()
+    for name, state in sorted(items):
+        digest.update(("%s\0%s\n" % (name, state)).encode("utf-8"))
+    return digest.hexdigest()
@@ -1,57 +1,135 @@
+import fnmatch
+import itertools
+import json
 import logging
 import os
 import re
+import tarfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import requests
+import urllib3
 import yaml
 from jsonschema.exceptions import ValidationError
 from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 
-from ubiconfig.config_types import UbiConfig
+from ubiconfig._impl.cache import CACHE_DIR, FileCache
+from ubiconfig._impl.snapshot import write_snapshot
 from ubiconfig.utils.api.gitlab import RepoApi
-from ubiconfig.utils.config_validation import validate_config
 
-from .base import PREFIX_VERSION_RE, Loader
+from .base import (
+    PREFIX_VERSION_RE,
+    ConfigChanges,
+    Loader,
+    fingerprint,
+    intern_configs,
+    ordered_results,
+    parse_config,
+)
 
 LOG = logging.getLogger("ubiconfig")
 
 GITLAB_RETRIES = int(os.getenv("UBICONFIG_GITLAB_RETRIES", "5"))
 GITLAB_BACKOFF = float(os.getenv("UBICONFIG_GITLAB_BACKOFF", "0.5"))
+GITLAB_CONCURRENCY = int(os.getenv("UBICONFIG_GITLAB_CONCURRENCY", "4"))
+GITLAB_FETCH_STRATEGY = os.getenv("UBICONFIG_GITLAB_FETCH_STRATEGY", "auto")
+GITLAB_ARCHIVE_THRESHOLD = int(os.getenv("UBICONFIG_GITLAB_ARCHIVE_THRESHOLD", "10"))
+
+FETCH_STRATEGIES = ("auto", "files", "archive")
 
 
 class GitlabLoader(Loader):
     """Load configuration from a remote repo on gitlab."""
 
-    def __init__(self, url, branch_prefix=None):
+    def __init__(
+        self, url, branch_prefix=None, cache_dir=None, versions=None, tree_path=None
+    ):
         """
+        Branches and files of the repo are discovered lazily, when they're
+        needed for the first time.
+
         :param url: gitlab repo url in form of `https://<host>/<repo>`
+        :param versions: list of branch name globs, only trees of matching
+            branches are listed
+        :param tree_path: list only files under this directory of the repo
+        :param cache_dir: directory used to cache file contents and metadata
+            between runs, defaults to ``UBICONFIG_CACHE_DIR``; caching is
+            disabled if unset
         """
         self._url = url
         self._session = None
+        self._pool_size = 0
+        cache_dir = cache_dir or CACHE_DIR
+        self._cache = None
+        self._metadata_cache = None
+        if cache_dir:
+            self._cache = FileCache(os.path.join(cache_dir, "gitlab"))
+            self._metadata_cache = FileCache(os.path.join(cache_dir, "gitlab-metadata"))
+        # {url: {"etag": .., "last_modified": .., "data": .., "headers": ..}}
+        # used for conditional requests of branch and tree metadata
+        self._metadata = {}
         self._branch_prefix = branch_prefix
+        self._versions = versions
+        self._tree_path = tree_path
         self._repo_api = RepoApi(self._url.rstrip("/"))
-        self._branches = self._get_branches()
-        self._files_branch_map = self._pre_load()
+        # {branch: sha1} of all branches, populated on first use
+        self._all_branches = None
+        # {branch: sha1} of branches resolved one by one by load()
+        self._branch_sha1 = {}
+        # {file_path: [(branch, sha1), ...]}, populated on first use
+        self._files_map = None
+        # {(sha1, file_path): blob_id} collected from tree listings
+        self._blob_ids = {}
+        # {(file_path, branch): (source, config)} of the last load_all, source is
+        # the blob id of the file or sha1 of the branch if blob id is unknown
+        self._loaded = None
+        # fingerprint of the branches seen by the last load_all
+        self._loaded_fingerprint = None
+
+    @property
+    def _branches(self):
+        if self._all_branches is None:
+            self._all_branches = self._get_branches()
+        return self._all_branches
+
+    @property
+    def _files_branch_map(self):
+        if self._files_map is None:
+            self._files_map = self._pre_load()
+        return self._files_map
 
     @property
     def session(self):
         if not self._session:
-            retries = Retry(
-                total=GITLAB_RETRIES,
-                status_forcelist=[429, 500, 502, 503, 504],
-                backoff_factor=GITLAB_BACKOFF,
-            )
-            session = requests.Session()
-            session.mount("https://", HTTPAdapter(max_retries=retries))
-            session.mount("http://", HTTPAdapter(max_retries=retries))
-            self._session = session
+            self._session = requests.Session()
+            # keep enough pooled connections around for concurrent load_all
+            self._mount_adapters(max(GITLAB_CONCURRENCY, 10))
 
         return self._session
 
-    def do_request(self, **kwargs):
+    def _mount_adapters(self, pool_size):
+        retries = Retry(
+            total=GITLAB_RETRIES,
+            status_forcelist=[429, 500, 502, 503, 504],
+            backoff_factor=GITLAB_BACKOFF,
+        )
+        for prefix in ("https://", "http://"):
+            self._session.mount(
+                prefix, HTTPAdapter(max_retries=retries, pool_maxsize=pool_size)
+            )
+        self._pool_size = pool_size
+
+    def do_request(self, missing_ok=False, **kwargs):
+        """Send a request to GitLab and return the response.
+
+        If ``missing_ok`` is True, None is returned instead of raising an error
+        when the requested resource doesn't exist.
+        """
         try:
             response = self.session.request(**kwargs)
+            if missing_ok and response.status_code == 404:
+                return None
             response.raise_for_status()
         except requests.exceptions.RequestException:
             LOG.exception(
@@ -61,6 +139,66 @@ class GitlabLoader(Loader):
 
         return response
 
+    def get_json(self, url, missing_ok=False):
+        """Get JSON metadata from GitLab using a conditional request.
+
+        ETag and Last-Modified of previous responses are remembered per url
+        (and stored in the metadata cache if enabled). When GitLab replies
+        with 304 Not Modified, the previously parsed data is reused.
+
+        Returns a tuple of the parsed data and a dictionary with pagination
+        headers of the response. If ``missing_ok`` is True and the resource
+        doesn't exist, ``(None, {})`` is returned.
+        """
+        cached = self._get_cached_metadata(url)
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self.do_request(
+            method="GET", url=url, headers=headers, missing_ok=missing_ok
+        )
+        if response is None:
+            return None, {}
+
+        if cached and response.status_code == 304:
+            LOG.debug("Metadata not modified: %s", url)
+            return cached["data"], cached["headers"]
+
+        data = self.try_json(response)
+        page_headers = {
+            name: response.headers[name]
+            for name in ("Link", "X-Total-Pages")
+            if name in response.headers
+        }
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            entry = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "data": data,
+                "headers": page_headers,
+            }
+            self._metadata[url] = entry
+            if self._metadata_cache:
+                self._metadata_cache.put(
+                    FileCache.make_key(url), json.dumps(entry).encode("utf-8")
+                )
+
+        return data, page_headers
+
+    def _get_cached_metadata(self, url):
+        if url not in self._metadata and self._metadata_cache:
+            raw = self._metadata_cache.get(FileCache.make_key(url))
+            if raw is not None:
+                self._metadata[url] = json.loads(raw.decode("utf-8"))
+
+        return self._metadata.get(url)
+
     def try_json(self, response):
         try:
             return response.json()
@@ -78,21 +216,20 @@ class GitlabLoader(Loader):
                 "Provide valid name of remote branch, provided %s" % version
             )
 
-        if file_name not in self._files_branch_map:
+        # only check the file list if it was already fetched, otherwise
+        # a missing file is detected when requesting its content
+        if self._files_map is not None and file_name not in self._files_map:
             raise ValueError(
                 "Couldn't find file %s from remote repo %s" % (file_name, self._url)
             )
 
-        match = re.match(PREFIX_VERSION_RE, version)  # type: ignore
-        prefix = match.group("prefix")  # type: ignore
-        default_version = match.group("default_version")  # type: ignore
-        default_branch = f"{prefix}{default_version}"
+        prefix, candidates = _branch_candidates(version)
 
         sha1 = None
         loaded_version = None
 
-        for branch_name in (version, default_branch):
-            sha1 = self._branches.get(branch_name)
+        for branch_name in candidates:
+            sha1 = self._get_branch_sha1(branch_name)
             if sha1:
                 loaded_version = branch_name.lstrip(prefix)
                 break
@@ -100,36 +237,313 @@ class GitlabLoader(Loader):
         if sha1 is None:
             raise ValueError(
                 "Couldn't find version %s and default branch %s from %s for %s"
-                % (version, default_branch, self._url, file_name)
+                % (version, candidates[-1], self._url, file_name)
             )
 
         LOG.info("Loading config file %s from branch %s", file_name, version)
-        config_file_url = self._repo_api.get_file_content_api(file_name, sha1)
-        response = self.do_request(method="GET", url=config_file_url)
-
-        config_dict = yaml.load(response.content, Loader=yaml.BaseLoader)
-        # validate input data
-        validate_config(config_dict)
-
-        return UbiConfig.load_from_dict(config_dict, file_name, loaded_version)
-
-    def load_all(self):
-        ubi_configs = []
-        for f in self._files_branch_map:
-            for branch_sha1 in self._files_branch_map[f]:
-                LOG.debug("Now loading %s from branch %s", f, branch_sha1[0])
-                try:
-                    ubi_configs.append(self.load(f, branch_sha1[0]))
-                except yaml.YAMLError:
-                    LOG.error(
-                        "%s FAILED loading because of Syntax error, skipping for now", f
-                    )
+        content = self._get_file_content(file_name, sha1)
+        if content is None:
+            raise ValueError(
+                "Couldn't find file %s from remote repo %s" % (file_name, self._url)
+            )
+
+        return parse_config(content, file_name, loaded_version)
+
+    def load_all(self, *, max_workers=None, strategy=None, intern=False):
+        """Load all config files from all matching branches.
+
+        Files are fetched, parsed and validated concurrently by a pool of
+        ``max_workers`` threads (defaults to ``UBICONFIG_GITLAB_CONCURRENCY``).
+        The returned list keeps the order of the file/branch mapping regardless
+        of the order in which the requests complete.
+
+        ``strategy`` selects how file contents are fetched (defaults to
+        ``UBICONFIG_GITLAB_FETCH_STRATEGY``):
+
+        - ``files``: one request per file
+        - ``archive``: one tar.gz archive of the repository per branch
+        - ``auto``: archive for branches with at least
+          ``UBICONFIG_GITLAB_ARCHIVE_THRESHOLD`` uncached files, files otherwise
+
+        See :meth:`~ubiconfig._impl.loaders.base.Loader.load_all` for
+        ``intern``.
+        """
+        self._loaded = self._load_all(max_workers, strategy)
+        configs = [config for _, config in self._loaded.values()]
+        return intern_configs(configs, intern)
+
+    def iter_all(self, ordered=True, on_error=None, *, max_workers=None, strategy=None):
+        """Yield configs of all config files from all matching branches as soon
+        as they're loaded.
+
+        See :meth:`~ubiconfig._impl.loaders.base.Loader.iter_all` for
+        ``ordered`` and ``on_error``, and :meth:`load_all` for ``max_workers``
+        and ``strategy``.
+        """
+        for _, _, config in self._iter_loaded(
+            max_workers, strategy, ordered=ordered, on_error=on_error
+        ):
+            yield config
+
+    def refresh(self, *, max_workers=None, strategy=None):
+        """Pick up changes of the repo since the last call of :meth:`load_all`
+        or :meth:`refresh`.
+
+        Branches and trees are requested again (conditionally), but only files
+        whose blob changed are fetched and loaded. Return
+        a :class:`~ubiconfig._impl.loaders.base.ConfigChanges` object.
+        """
+        previous = self._loaded or {}
+        self._all_branches = None
+        self._branch_sha1 = {}
+        self._files_map = None
+        self._blob_ids = {}
+
+        self._loaded = self._load_all(max_workers, strategy, previous)
+
+        return ConfigChanges.from_loaded(previous, self._loaded)
+
+    def fingerprint(self):
+        """Return a fingerprint of the heads of all matching branches.
+
+        Only the branch list is requested (conditionally).
+        """
+        return self._branches_fingerprint(self._get_branches())
+
+    def snapshot(self, path):
+        """Write all loaded configs to a snapshot file.
+
+        See :meth:`~ubiconfig._impl.loaders.base.Loader.snapshot`.
+        """
+        if self._loaded is None:
+            self.load_all()
+        write_snapshot(path, self._loaded, self._loaded_fingerprint, self._url)
+
+    def _branches_fingerprint(self, branches):
+        return fingerprint(
+            (branch, sha1)
+            for branch, sha1 in branches.items()
+            if _wanted_branch(branch, self._branch_prefix, self._versions, log=False)
+        )
+
+    def _load_all(self, max_workers, strategy, previous=None):
+        """Load all config files, reusing configs from ``previous`` whose source
+        didn't change. Return a {(file_path, branch): (source, config)} mapping.
+
+        The fingerprint of the branches the configs were loaded from is kept
+        for :meth:`snapshot`.
+        """
+        loaded = {
+            key: (source, config)
+            for key, source, config in self._iter_loaded(
+                max_workers, strategy, previous
+            )
+        }
+        self._loaded_fingerprint = self._branches_fingerprint(self._branches)
+        return loaded
+
+    def _iter_loaded(
+        self, max_workers, strategy, previous=None, ordered=True, on_error=None
+    ):
+        """Load all config files, reusing configs from ``previous`` whose source
+        didn't change. Yield a ((file_path, branch), source, config) tuple for
+        every loaded config.
+        """
+        max_workers = max_workers or GITLAB_CONCURRENCY
+        strategy = strategy or GITLAB_FETCH_STRATEGY
+        if strategy not in FETCH_STRATEGIES:
+            raise ValueError(
+                "Unknown fetch strategy %s, expected one of %s"
+                % (strategy, ", ".join(FETCH_STRATEGIES))
+            )
+        previous = previous or {}
+        # list all branches up front, so that load() doesn't resolve them
+        # one by one
+        self._branches  # pylint: disable=pointless-statement
+        jobs = [
+            (f, branch, sha1, self._blob_ids.get((sha1, f)) or sha1)
+            for f in self._files_branch_map
+            for branch, sha1 in self._files_branch_map[f]
+        ]
+        reused = []
+        todo = []
+        for i, (f, branch, sha1, source) in enumerate(jobs):
+            old = previous.get((f, branch))
+            if old and old[0] == source:
+                reused.append((i, (old[1], None)))
+            else:
+                todo.append(i)
+
+        archive_branches = self._archive_branches(strategy, [jobs[i][:3] for i in todo])
+        # make sure the session is created once, before worker threads use it,
+        # with a connection pool large enough for all of them
+        self.session  # pylint: disable=pointless-statement
+        if max_workers > self._pool_size:
+            self._mount_adapters(max_workers)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {}
+        archives = {}
+        try:
+            for branch, (sha1, files) in archive_branches.items():
+                archives[executor.submit(self._fetch_archive, sha1, files)] = branch
+            # files of other branches are loaded while the archives download,
+            # files of an archive as soon as it's fetched
+            archive_jobs = {}
+            for i in todo:
+                f, branch = jobs[i][:2]
+                if branch in archive_branches:
+                    archive_jobs.setdefault(branch, []).append(i)
+                else:
+                    futures[executor.submit(self._try_load, f, branch)] = i
+
+            loaded = self._completed(executor, jobs, futures, archives, archive_jobs)
+            results = itertools.chain(reused, loaded)
+            for i, (config, error) in ordered_results(results, ordered):
+                f, branch, _, source = jobs[i]
+                if error is not None:
+                    _report_error(f, branch, error, on_error)
                     continue
-                except ValidationError as e:
-                    LOG.error("%s FAILED schema validation:\n%s\nSkip for now", f, e)
+                yield (f, branch), source, config
+        finally:
+            for future in itertools.chain(futures, archives):
+                future.cancel()
+            executor.shutdown()
+
+        if self._cache:
+            LOG.info(
+                "File content cache: %(hits)s hits, %(misses)s misses",
+                self._cache.stats(),
+            )
+
+    def _completed(self, executor, jobs, futures, archives, archive_jobs):
+        """Yield (job index, (config, error)) tuples of ``futures`` as they
+        complete.
+
+        When a future of ``archives`` ({future: branch}) completes, files of
+        the branch listed in ``archive_jobs`` ({branch: [job index, ...]}) are
+        submitted to be loaded from the archive and added to ``futures``.
+        """
+        pending = set(futures) | set(archives)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future not in archives:
+                    yield futures[future], future.result()
                     continue
+                contents = future.result()
+                for i in archive_jobs.get(archives[future], []):
+                    f, branch = jobs[i][:2]
+                    # files missing in the archive are requested one by one
+                    job = executor.submit(self._try_load, f, branch, contents.get(f))
+                    futures[job] = i
+                    pending.add(job)
+
+    def _archive_branches(self, strategy, jobs):
+        """Return a {branch: (sha1, [file_path, ...])} mapping of branches which
+        should be fetched as an archive, for given (file_path, branch, sha1) jobs.
+        """
+        branch_files = {}
+        for f, branch, sha1 in jobs:
+            branch_files.setdefault(branch, (sha1, []))[1].append(f)
+
+        if strategy == "files":
+            return {}
+        if strategy == "archive":
+            return branch_files
+
+        out = {}
+        for branch, (sha1, files) in branch_files.items():
+            uncached = [
+                f
+                for f in files
+                if not self._cache
+                or _content_cache_key(self._url, self._blob_ids, f, sha1)
+                not in self._cache
+            ]
+            if len(uncached) >= GITLAB_ARCHIVE_THRESHOLD:
+                out[branch] = (sha1, files)
+        return out
+
+    def _fetch_archive(self, sha1, file_names):
+        """Download the repository archive at the given commit and return
+        a {file_path: content} mapping of the requested config files.
+
+        The archive is streamed and only config files are read from it.
+        An empty mapping is returned if the archive can't be fetched.
+        """
+        wanted = set(file_names)
+        contents = {}
+        url = self._repo_api.get_archive_api(sha1, self._tree_path)
+        LOG.info("Loading config files from archive at %s", sha1)
+        try:
+            with self.do_request(method="GET", url=url, stream=True) as response:
+                response.raw.decode_content = True
+                with tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+                    for member in archive:
+                        if not member.isfile():
+                            continue
+                        # members are stored under a <project>-<sha1> directory
+                        path = member.name.split("/", 1)[-1]
+                        if path not in wanted:
+                            continue
+                        contents[path] = archive.extractfile(member).read()
+        except (
+            requests.exceptions.RequestException,
+            urllib3.exceptions.HTTPError,
+            tarfile.TarError,
+        ):
+            LOG.warning(
+                "Cannot load archive at %s, loading files one by one",
+                sha1,
+                exc_info=True,
+            )
+            return {}
+
+        if self._cache:
+            for path, content in contents.items():
+                self._cache.put(
+                    _content_cache_key(self._url, self._blob_ids, path, sha1), content
+                )
+
+        return contents
+
+    def _get_file_content(self, file_name, sha1):
+        """Get raw content of the file at the given commit.
+
+        Content of a file at a commit never changes, so it's served from the
+        local cache when available.
+        """
+        cache_key, content = _cached_content(
+            self._cache, self._url, self._blob_ids, file_name, sha1
+        )
+        if content is not None:
+            return content
+
+        config_file_url = self._repo_api.get_file_content_api(file_name, sha1)
+        response = self.do_request(method="GET", url=config_file_url, missing_ok=True)
+        if response is None:
+            return None
+
+        if cache_key:
+            self._cache.put(cache_key, response.content)
+
+        return response.content
 
-        return ubi_configs
+    def _try_load(self, file_name, version, content=None):
+        """Load a single file, return a (config, error) tuple, where error is
+        the exception raised for an invalid config file or None.
+
+        If the content of the file is given, it's parsed instead of fetched.
+        """
+        LOG.debug("Now loading %s from branch %s", file_name, version)
+        try:
+            if content is None:
+                return self.load(file_name, version), None
+            prefix, _ = _branch_candidates(version)
+            return parse_config(content, file_name, version.lstrip(prefix)), None
+        except (yaml.YAMLError, ValidationError) as e:
+            return None, e
 
     def _pre_load(self):
         """
@@ -141,48 +555,60 @@ class GitlabLoader(Loader):
         LOG.debug("Loading config files from all branches")
 
         for branch, sha1 in self._branches.items():
-            branch_regex = re.match(PREFIX_VERSION_RE, branch)
-            if not branch_regex:
-                LOG.warning(
-                    "Skipping branch %s (name does not match with required format)",
-                    branch,
-                )
-                continue
-            prefix = branch_regex.group("prefix")
-            if self._branch_prefix and self._branch_prefix != prefix:
-                LOG.warning(
-                    "Skipping branch %s \
-                        (branch does not match with cdn definition branch %s)",
-                    prefix,
-                    self._branch_prefix,
-                )
+            if not _wanted_branch(branch, self._branch_prefix, self._versions):
                 continue
-            page = 1
-            while True:
-                file_list_api = self._repo_api.get_file_list_api(branch=sha1, page=page)
-                response = self.do_request(method="GET", url=file_list_api)
-                data = self.try_json(response)
-                file_list = [
-                    f["path"] for f in data if f["name"].endswith((".yaml", ".yml"))
-                ]
-                for f in file_list:
-                    files_branch_map.setdefault(f, []).append((branch, sha1))
-                    # now the map is {filename: [(branch1, sha1), (branch2, sha1),...]}
-                    # same file name could map to multiple config files.
-                if page >= int(response.headers.get("X-Total-Pages", 1)):
-                    break
-                page += 1
+            for entry in self._list_tree(sha1):
+                if not _is_config_entry(entry):
+                    continue
+                files_branch_map.setdefault(entry["path"], []).append((branch, sha1))
+                # now the map is {filename: [(branch1, sha1), (branch2, sha1),...]}
+                # same file name could map to multiple config files.
+                if "id" in entry:
+                    self._blob_ids[(sha1, entry["path"])] = entry["id"]
 
         return files_branch_map
 
+    def _list_tree(self, sha1):
+        """Yield all entries of the repository tree at the given commit.
+
+        The tree is listed recursively in large pages. Keyset pagination is
+        requested and the next page is followed from the ``Link`` header; for
+        GitLab instances without keyset support, ``X-Total-Pages`` is used.
+        """
+        page, url = _next_tree_page(self._repo_api, sha1, self._tree_path)
+        while url:
+            data, headers = self.get_json(url)
+            for entry in data:
+                yield entry
+
+            page, url = _next_tree_page(
+                self._repo_api, sha1, self._tree_path, page, headers
+            )
+
+    def _get_branch_sha1(self, branch):
+        """Get sha1 of the branch head or None if the branch doesn't exist.
+
+        If all branches were already listed, that list is used. Otherwise only
+        the given branch is requested.
+        """
+        if self._all_branches is not None:
+            return self._all_branches.get(branch)
+
+        if branch not in self._branch_sha1:
+            data, _ = self.get_json(
+                self._repo_api.get_branch_api(branch), missing_ok=True
+            )
+            self._branch_sha1[branch] = data["commit"]["id"] if data else None
+
+        return self._branch_sha1[branch]
+
     def _get_branches(self):
         """Get a {branch: sha1} mapping for all branches of a given repo"""
         branch_sha1 = {}
 
         LOG.info("Getting branches of the repo %s", self._url)
         branches_list_api = self._repo_api.get_branch_list_api()
-        response = self.do_request(method="GET", url=branches_list_api)
-        data = self.try_json(response)
+        data, _ = self.get_json(branches_list_api)
 
         if not data:
             raise RuntimeError("Please check %s is in right format" % self._url)
@@ -190,3 +616,125 @@ class GitlabLoader(Loader):
             branch_sha1[b["name"]] = b["commit"]["id"]
 
         return branch_sha1
+
+
+def _report_error(file_name, version, error, on_error=None):
+    """Log the exception raised for an invalid config file or pass it to the
+    ``on_error`` callback.
+    """
+    if on_error is not None:
+        on_error(file_name, version, error)
+    elif isinstance(error, yaml.YAMLError):
+        LOG.error(
+            "%s FAILED loading because of Syntax error, skipping for now",
+            file_name,
+        )
+    else:
+        LOG.error("%s FAILED schema validation:\n%s\nSkip for now", file_name, error)
+
+
+def _branch_candidates(version):
+    """Return the prefix of the version and branches to load it from.
+
+    The branch named after the version is preferred, the branch of its major
+    version (e.g. ``ubi8`` for ``ubi8.6``) is used as a fallback.
+    """
+    match = re.match(PREFIX_VERSION_RE, version)  # type: ignore
+    prefix = match.group("prefix")  # type: ignore
+    default_version = match.group("default_version")  # type: ignore
+    default_branch = f"{prefix}{default_version}"
+
+    return prefix, (version, default_branch)
+
+
+def _wanted_branch(branch, branch_prefix, versions, log=True):
+    """Return True if config files should be listed from the branch.
+    Log a warning when invalid branch names are used, unless ``log`` is False.
+    """
+    branch_regex = re.match(PREFIX_VERSION_RE, branch)
+    if not branch_regex:
+        if log:
+            LOG.warning(
+                "Skipping branch %s (name does not match with required format)",
+                branch,
+            )
+        return False
+    prefix = branch_regex.group("prefix")
+    if branch_prefix and branch_prefix != prefix:
+        if log:
+            LOG.warning(
+                "Skipping branch %s \
+                    (branch does not match with cdn definition branch %s)",
+                prefix,
+                branch_prefix,
+            )
+        return False
+    if versions and not any(
+        fnmatch.fnmatchcase(branch, pattern) for pattern in versions
+    ):
+        if log:
+            LOG.debug("Skipping branch %s (not in requested versions)", branch)
+        return False
+
+    return True
+
+
+def _is_config_entry(entry):
+    """Return True if the repository tree entry is a config file."""
+    # recursive listing includes directories too
+    if entry.get("type", "blob") != "blob":
+        return False
+    return entry["name"].endswith((".yaml", ".yml"))
+
+
+def _next_page_url(headers):
+    """Return url of the next page linked from the ``Link`` header, if any."""
+    for link in requests.utils.parse_header_links(headers.get("Link") or ""):
+        if link.get("rel") == "next":
+            return link["url"]
+    return None
+
+
+def _next_tree_page(repo_api, sha1, path, page=0, headers=None):
+    """Return a (page, url) tuple of the tree listing page following the page
+    with the given number and response headers, url is None after the last
+    page. Without headers, the first page is returned.
+
+    Keyset pagination is requested and the next page is followed from the
+    ``Link`` header; for GitLab instances without keyset support,
+    ``X-Total-Pages`` is used.
+    """
+    if headers is None:
+        return 1, repo_api.get_file_list_api(1, branch=sha1, path=path, keyset=True)
+
+    url = _next_page_url(headers)
+    if not url and page < int(headers.get("X-Total-Pages", 1)):
+        page += 1
+        url = repo_api.get_file_list_api(page, branch=sha1, path=path)
+    return page, url
+
+
+def _content_cache_key(url, blob_ids, file_name, sha1):
+    """Return the cache key of the file content at the given commit, given
+    the {(sha1, file_path): blob_id} mapping collected from tree listings.
+    """
+    # blob id is a hash of the content, so the same file in different
+    # branches is cached only once
+    blob_id = blob_ids.get((sha1, file_name))
+    if blob_id:
+        return FileCache.make_key(url, blob_id)
+    return FileCache.make_key(url, sha1, file_name)
+
+
+def _cached_content(cache, url, blob_ids, file_name, sha1):
+    """Return a (cache_key, content) tuple of the file content at the given
+    commit, content is None if it isn't cached and cache_key is None if
+    caching is disabled.
+    """
+    if not cache:
+        return None, None
+    cache_key = _content_cache_key(url, blob_ids, file_name, sha1)
+    content = cache.get(cache_key)
+    if content is not None:
+        LOG.debug("Using cached content of %s at %s", file_name, sha1)
+    return cache_key, content
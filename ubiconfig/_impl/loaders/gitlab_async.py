@@ -0,0 +1,333 @@
+import asyncio
+import json
+import logging
+import os
+
+import yaml
+from jsonschema.exceptions import ValidationError
+
+from ubiconfig._impl.cache import CACHE_DIR, FileCache
+from ubiconfig.utils.api.gitlab import RepoApi
+
+from .base import intern_configs, parse_config
+from .gitlab import (
+    GITLAB_BACKOFF,
+    GITLAB_CONCURRENCY,
+    GITLAB_RETRIES,
+    _branch_candidates,
+    _cached_content,
+    _is_config_entry,
+    _next_tree_page,
+    _report_error,
+    _wanted_branch,
+)
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+LOG = logging.getLogger("ubiconfig")
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class AsyncGitlabLoader(object):
+    """Load configuration from a remote repo on gitlab using asyncio.
+
+    Only the coroutine methods :meth:`aload` and :meth:`aload_all` and the
+    asynchronous generator :meth:`aiter_all` are available. The loader holds
+    an HTTP connection pool which should be released by :meth:`aclose` or by
+    using the loader as an async context manager.
+
+    It isn't a :class:`~ubiconfig.Loader`, its methods are counterparts of
+    the synchronous ones and can't be used in their place.
+    """
+
+    def __init__(
+        self,
+        url,
+        branch_prefix=None,
+        cache_dir=None,
+        versions=None,
+        max_connections=None,
+        tree_path=None,
+    ):
+        """
+        :param url: gitlab repo url in form of `https://<host>/<repo>`
+        :param versions: list of branch name globs, only trees of matching
+            branches are listed
+        :param tree_path: list only files under this directory of the repo
+        :param cache_dir: directory used to cache file contents between runs,
+            defaults to ``UBICONFIG_CACHE_DIR``; caching is disabled if unset
+        :param max_connections: maximum number of concurrent requests,
+            defaults to ``UBICONFIG_GITLAB_CONCURRENCY``
+        """
+        if aiohttp is None:
+            raise RuntimeError(
+                "aiohttp is required for asynchronous loading, "
+                "install ubi-config[async]"
+            )
+
+        self._url = url
+        self._branch_prefix = branch_prefix
+        self._versions = versions
+        self._tree_path = tree_path
+        self._max_connections = max_connections or GITLAB_CONCURRENCY
+        self._repo_api = RepoApi(self._url.rstrip("/"))
+        cache_dir = cache_dir or CACHE_DIR
+        self._cache = (
+            FileCache(os.path.join(cache_dir, "gitlab")) if cache_dir else None
+        )
+        self._session = None
+        self._semaphore = None
+        self._all_branches = None
+        self._branch_sha1 = {}
+        self._files_map = None
+        self._blob_ids = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the HTTP connection pool of the loader."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # the session and semaphore are bound to the running event loop,
+        # so they can't be created in __init__
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._max_connections)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self._max_connections)
+        return self._session
+
+    async def do_request(self, url, missing_ok=False):
+        """Send a GET request to GitLab, retrying on server errors.
+
+        Returns a tuple of the response body and headers. If ``missing_ok`` is
+        True, None is returned when the requested resource doesn't exist.
+        """
+        session = self._get_session()
+        for attempt in range(GITLAB_RETRIES + 1):
+            last_attempt = attempt == GITLAB_RETRIES
+            try:
+                async with self._semaphore, session.get(url) as response:
+                    if missing_ok and response.status == 404:
+                        return None
+                    if response.status not in RETRY_STATUSES or last_attempt:
+                        response.raise_for_status()
+                        return await response.read(), response.headers
+            except aiohttp.ClientResponseError:
+                LOG.exception(
+                    "Error ocurred during request to GitLab, check exception details."
+                )
+                raise
+            except aiohttp.ClientError:
+                if last_attempt:
+                    LOG.exception(
+                        "Error ocurred during request to GitLab, "
+                        "check exception details."
+                    )
+                    raise
+
+            await asyncio.sleep(GITLAB_BACKOFF * (2**attempt))
+
+    async def get_json(self, url, missing_ok=False):
+        """Get JSON metadata from GitLab.
+
+        Returns a tuple of the parsed data and the response headers, or
+        ``(None, {})`` if ``missing_ok`` is True and the resource is missing.
+        """
+        result = await self.do_request(url, missing_ok=missing_ok)
+        if result is None:
+            return None, {}
+
+        body, headers = result
+        try:
+            return json.loads(body), headers
+        except ValueError:
+            LOG.exception("Cannot convert response to JSON.")
+            raise
+
+    async def aload(self, file_name, version=None):
+        """Load file from remote repository.
+        :param file_name: filename that is on remote repository in any branch
+        :param version: name of remote branch
+        """
+        if version is None:
+            raise ValueError(
+                "Provide valid name of remote branch, provided %s" % version
+            )
+
+        if self._files_map is not None and file_name not in self._files_map:
+            raise ValueError(
+                "Couldn't find file %s from remote repo %s" % (file_name, self._url)
+            )
+
+        prefix, candidates = _branch_candidates(version)
+
+        sha1 = None
+        loaded_version = None
+
+        for branch_name in candidates:
+            sha1 = await self._get_branch_sha1(branch_name)
+            if sha1:
+                loaded_version = branch_name.lstrip(prefix)
+                break
+
+        if sha1 is None:
+            raise ValueError(
+                "Couldn't find version %s and default branch %s from %s for %s"
+                % (version, candidates[-1], self._url, file_name)
+            )
+
+        LOG.info("Loading config file %s from branch %s", file_name, version)
+        content = await self._get_file_content(file_name, sha1)
+        if content is None:
+            raise ValueError(
+                "Couldn't find file %s from remote repo %s" % (file_name, self._url)
+            )
+
+        # parsing and validation are CPU bound, keep them off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, parse_config, content, file_name, loaded_version
+        )
+
+    async def aload_all(self, *, intern=False):
+        """Load all config files from all matching branches concurrently.
+
+        The returned list keeps the order of the file/branch mapping, invalid
+        config files are skipped. See
+        :meth:`~ubiconfig._impl.loaders.base.Loader.load_all` for ``intern``.
+        """
+        configs = [config async for config in self.aiter_all()]
+        return intern_configs(configs, intern)
+
+    async def aiter_all(self, ordered=True, on_error=None):
+        """Yield configs of all config files from all matching branches as soon
+        as they're loaded, all files are loaded concurrently.
+
+        See :meth:`~ubiconfig._impl.loaders.base.Loader.iter_all` for
+        ``ordered`` and ``on_error``.
+        """
+        await self._get_branches()
+        files_branch_map = await self._get_files_branch_map()
+        tasks = [
+            asyncio.ensure_future(self._try_load(f, branch))
+            for f in files_branch_map
+            for branch, _ in files_branch_map[f]
+        ]
+        try:
+            for task in tasks if ordered else asyncio.as_completed(tasks):
+                file_name, version, config, error = await task
+                if error is not None:
+                    _report_error(file_name, version, error, on_error)
+                    continue
+                yield config
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _try_load(self, file_name, version):
+        """Load a single file, return a (file_name, version, config, error)
+        tuple, where error is the exception raised for an invalid config file
+        or None.
+        """
+        LOG.debug("Now loading %s from branch %s", file_name, version)
+        try:
+            return file_name, version, await self.aload(file_name, version), None
+        except (yaml.YAMLError, ValidationError) as e:
+            return file_name, version, None, e
+
+    async def _get_file_content(self, file_name, sha1):
+        cache_key, content = _cached_content(
+            self._cache, self._url, self._blob_ids, file_name, sha1
+        )
+        if content is not None:
+            return content
+
+        result = await self.do_request(
+            self._repo_api.get_file_content_api(file_name, sha1), missing_ok=True
+        )
+        if result is None:
+            return None
+
+        content = result[0]
+        if cache_key:
+            self._cache.put(cache_key, content)
+
+        return content
+
+    async def _get_files_branch_map(self):
+        """Get a mapping of {file_path: [(branch, sha1), ...]}, trees of all
+        matching branches are listed concurrently.
+        """
+        if self._files_map is not None:
+            return self._files_map
+
+        LOG.debug("Loading config files from all branches")
+        branches = [
+            (branch, sha1)
+            for branch, sha1 in (await self._get_branches()).items()
+            if _wanted_branch(branch, self._branch_prefix, self._versions)
+        ]
+        trees = await asyncio.gather(*[self._list_tree(sha1) for _, sha1 in branches])
+
+        files_branch_map = {}
+        for (branch, sha1), entries in zip(branches, trees):
+            for entry in entries:
+                if not _is_config_entry(entry):
+                    continue
+                files_branch_map.setdefault(entry["path"], []).append((branch, sha1))
+                if "id" in entry:
+                    self._blob_ids[(sha1, entry["path"])] = entry["id"]
+
+        self._files_map = files_branch_map
+        return files_branch_map
+
+    async def _list_tree(self, sha1):
+        """Return all entries of the repository tree at the given commit."""
+        entries = []
+        page, url = _next_tree_page(self._repo_api, sha1, self._tree_path)
+        while url:
+            data, headers = await self.get_json(url)
+            entries.extend(data)
+
+            page, url = _next_tree_page(
+                self._repo_api, sha1, self._tree_path, page, headers
+            )
+
+        return entries
+
+    async def _get_branch_sha1(self, branch):
+        if self._all_branches is not None:
+            return self._all_branches.get(branch)
+
+        if branch not in self._branch_sha1:
+            data, _ = await self.get_json(
+                self._repo_api.get_branch_api(branch), missing_ok=True
+            )
+            self._branch_sha1[branch] = data["commit"]["id"] if data else None
+
+        return self._branch_sha1[branch]
+
+    async def _get_branches(self):
+        """Get a {branch: sha1} mapping for all branches of a given repo"""
+        if self._all_branches is not None:
+            return self._all_branches
+
+        LOG.info("Getting branches of the repo %s", self._url)
+        data, _ = await self.get_json(self._repo_api.get_branch_list_api())
+
+        if not data:
+            raise RuntimeError("Please check %s is in right format" % self._url)
+
+        self._all_branches = {b["name"]: b["commit"]["id"] for b in data}
+        return self._all_branches
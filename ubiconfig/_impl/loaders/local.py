@@ -1,33 +1,94 @@
+import fnmatch
+import functools
+import hashlib
+import itertools
+import json
 import logging
 import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import yaml
 from jsonschema.exceptions import ValidationError
 
+from ubiconfig._impl.cache import CACHE_DIR, CACHE_VERIFY_HASH, FileCache
+from ubiconfig._impl.snapshot import write_snapshot
 from ubiconfig.config_types import UbiConfig
-from ubiconfig.utils.config_validation import validate_config
+from ubiconfig.utils.config_validation import DEFAULT_SCHEMA
 
-from .base import PREFIX_VERSION_RE
+from .base import (
+    PREFIX_VERSION_RE,
+    ConfigChanges,
+    Loader,
+    fingerprint,
+    intern_configs,
+    load_config_dict,
+    ordered_results,
+)
+
+try:
+    import inotify_simple
+except ImportError:  # pragma: no cover
+    inotify_simple = None
 
 LOG = logging.getLogger("ubiconfig")
 
 
-class LocalLoader(object):
+class WatchEvent(object):
+    """A change of a config file reported by :meth:`LocalLoader.watch`."""
+
+    UPDATED = "updated"
+    REMOVED = "removed"
+
+    def __init__(self, kind, path, version, config=None):
+        """
+        Args:
+            kind(str): :attr:`UPDATED` for new or modified files,
+                :attr:`REMOVED` for removed files
+            path(str): path to the config file
+            version(str): version of the config file
+            config(UbiConfig): the loaded config, None for removed files
+        """
+        self.kind = kind
+        self.path = path
+        self.version = version
+        self.config = config
+
+    def __repr__(self):
+        return "<WatchEvent: %s %s>" % (self.kind, self.path)
+
+
+class LocalLoader(Loader):
     """Load configuration from a local directory tree."""
 
-    def __init__(self, path):
+    def __init__(self, path, cache_dir=None, versions=None):
         """
         Args:
             path (str): a local path to config files
+            cache_dir (str): directory used to cache parsed and validated
+                config files between runs, defaults to ``UBICONFIG_CACHE_DIR``;
+                caching is disabled if unset
+            versions (list): version directory name globs, e.g. ``["ubi9*"]``,
+                directories of other versions are not scanned
         """
 
         self._path = path
-        self._isroot = False
-        # when load_all is called, the path returned includes self._path, no
-        # need to join again.
-        self._ver_files_map = self._get_local_files_map()
-        # a {version: [file]} map
+        self._versions = versions
+        cache_dir = cache_dir or CACHE_DIR
+        self._cache = FileCache(os.path.join(cache_dir, "local")) if cache_dir else None
+        self._files_map = None
+        # a {version: [file]} map, discovered on first use
+        self._loaded = None
+        # {(file, version): ((mtime, size), config)} of the last load_all
+        self._loaded_fingerprint = None
+        # fingerprint of the files seen by the last load_all
+
+    @property
+    def _ver_files_map(self):
+        if self._files_map is None:
+            self._files_map = self._get_local_files_map()
+        return self._files_map
 
     def load(self, file_name, version=None):
         """Load a config file from local.
@@ -42,70 +103,496 @@ class LocalLoader(object):
 
                 If version is None, we should get it from its path.
         """
-        if not self._isroot:
-            file_path = os.path.join(self._path, file_name)
-        else:
-            file_path = file_name
+        file_path = os.path.join(self._path, file_name)
 
         if version is None:
             # get version from path, such as configs/ubi7.1/config.yaml, get
             # ubi7.1
             version = os.path.basename(os.path.dirname(os.path.abspath(file_path)))
 
-        match = re.match(PREFIX_VERSION_RE, version)
+        return _load_file(file_path, file_name, version, self._cache)
 
-        if not match:
-            raise ValueError(
-                f"Expected directories named in format '<PREFIX><MAJOR_VERSION>[.<MINOR_VERSION>]', but got {version}"
-            )
-        prefix = match.group("prefix")
+    def load_all(self, *, workers=None, intern=False):
+        """Load all config file from a local directory and all its subdirectories
 
-        LOG.info("Loading configuration file locally: %s", file_path)
+        Parsing and validation is CPU bound, if ``workers`` is greater than 1,
+        files are loaded by a pool of that many processes. The order of
+        returned configs is the same in both cases.
 
-        with open(file_path, "r") as f:
-            config_dict = yaml.load(f, Loader=yaml.BaseLoader)
-        # validate input data
-        validate_config(config_dict)
+        See :meth:`~ubiconfig._impl.loaders.base.Loader.load_all` for
+        ``intern``.
+        """
+
+        self._loaded = self._load_all(workers=workers)
+        configs = [config for _, config in self._loaded.values()]
+        return intern_configs(configs, intern)
+
+    def iter_all(self, ordered=True, on_error=None, *, workers=None):
+        """Yield configs of all config files from a local directory and all its
+        subdirectories as soon as they're loaded.
+
+        See :meth:`~ubiconfig._impl.loaders.base.Loader.iter_all` for
+        ``ordered`` and ``on_error``, and :meth:`load_all` for ``workers``.
+        """
+        for _, _, config in self._iter_loaded(
+            workers=workers, ordered=ordered, on_error=on_error
+        ):
+            yield config
 
-        return UbiConfig.load_from_dict(config_dict, file_name, version.lstrip(prefix))
+    def refresh(self, *, workers=None):
+        """Pick up changes of the local directory since the last call of
+        :meth:`load_all` or :meth:`refresh`.
+
+        The directory is walked again, but only files whose modification time
+        or size changed are loaded. Return
+        a :class:`~ubiconfig._impl.loaders.base.ConfigChanges` object.
+        """
+        previous = self._loaded or {}
+        self._files_map = self._get_local_files_map()
+        self._loaded = self._load_all(previous, workers)
+
+        return ConfigChanges.from_loaded(previous, self._loaded)
+
+    def fingerprint(self):
+        """Return a fingerprint of paths, modification times and sizes of all
+        config files in the local directory.
+        """
+        items = []
+        for files in self._get_local_files_map().values():
+            for f in files:
+                state = _file_state(f)
+                if state:
+                    items.append((f, state))
+        return fingerprint(items)
 
-    def load_all(self):
-        """Load all config file from a local directory and all its subdirectories"""
+    def snapshot(self, path):
+        """Write all loaded configs to a snapshot file.
 
-        ubi_configs = []
-        self._isroot = True
+        See :meth:`~ubiconfig._impl.loaders.base.Loader.snapshot`.
+        """
+        if self._loaded is None:
+            self.load_all()
+        write_snapshot(path, self._loaded, self._loaded_fingerprint, self._path)
+
+    def watch(self, interval=1.0, use_inotify=None):
+        """Watch the local directory and yield a :class:`WatchEvent` for every
+        config file which is added, modified or removed.
+
+        Changes are detected with inotify if the optional ``inotify_simple``
+        package is available (``use_inotify`` can force or disable it), and by
+        polling modification times and sizes every ``interval`` seconds
+        otherwise. Only changed directories are scanned again and the list of
+        config files of the loader is updated in place.
+
+        The generator runs until it's closed by the caller.
+        """
+        if use_inotify and inotify_simple is None:
+            raise RuntimeError("inotify_simple is required for watching with inotify")
+        if use_inotify is None:
+            use_inotify = inotify_simple is not None
+
+        # take a snapshot now, so changes done before iterating are reported
+        dirs = {}
+        for root, _, _ in _scan_dirs(self._path, self._versions):
+            dirs[root] = _dir_mtime(root)
+        files = {}
+        for version_files in self._ver_files_map.values():
+            for f in version_files:
+                files[f] = _file_state(f)
+
+        if use_inotify:
+            return self._watch_inotify(dirs, files, interval)
+        return self._watch_polling(dirs, files, interval)
+
+    def _watch_polling(self, dirs, files, interval):
+        while True:
+            dirty = _changed_dirs(dirs, files)
+            if not dirty:
+                time.sleep(interval)
+                continue
+
+            for d in sorted(dirty):
+                for event in self._rescan_dir(d, dirs, files):
+                    yield event
+
+    def _watch_inotify(self, dirs, files, interval):
+        # created on first iteration, so a generator which is never iterated
+        # doesn't leak the inotify file descriptor
+        inotify = inotify_simple.INotify()
+        try:
+            watches = {}
+            _add_watches(inotify, watches, dirs)
+            # changes done before the watches were added
+            dirty = _changed_dirs(dirs, files)
+            while True:
+                for d in sorted(dirty):
+                    for event in self._rescan_dir(d, dirs, files):
+                        yield event
+                _add_watches(inotify, watches, dirs)
+
+                events = inotify.read(timeout=int(interval * 1000))
+                dirty = set(watches[e.wd] for e in events if e.wd in watches)
+                for e in events:
+                    if e.mask & inotify_simple.flags.IGNORED:
+                        watches.pop(e.wd, None)
+        finally:
+            inotify.close()
+
+    def _rescan_dir(self, d, dirs, files):
+        """Compare the directory with the known state, update the state and the
+        list of config files and yield events for changed config files.
+        """
+        _, version = _dir_version(d, self._versions)
+        known = set(f for f in files if os.path.dirname(f) == d)
+        current = {}
+        subdirs = []
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith(".") and (
+                            _dir_version(entry.path, self._versions)[0]
+                        ):
+                            subdirs.append(entry.path)
+                    elif version and entry.name.endswith((".yaml", ".yml")):
+                        current[entry.path] = _file_state(entry.path)
+            dirs[d] = _dir_mtime(d)
+        except OSError:
+            # the directory was removed
+            dirs.pop(d, None)
+            for sub in [sub for sub in dirs if sub.startswith(d + os.sep)]:
+                for event in self._rescan_dir(sub, dirs, files):
+                    yield event
+
+        for f in sorted(known - set(current)):
+            del files[f]
+            version_files = self._ver_files_map.get(version, [])
+            if f in version_files:
+                version_files.remove(f)
+            if not version_files:
+                self._ver_files_map.pop(version, None)
+            yield WatchEvent(WatchEvent.REMOVED, f, version)
+
+        for f, state in sorted(current.items()):
+            if f in known and files[f] == state:
+                continue
+            files[f] = state
+            if f not in known:
+                self._ver_files_map.setdefault(version, []).append(f)
+            config = self._try_watched_load(f, version)
+            if config is not None:
+                yield WatchEvent(WatchEvent.UPDATED, f, version, config)
+
+        for sub in subdirs:
+            if sub not in dirs:
+                # a new directory, report all its config files
+                dirs[sub] = None
+                for event in self._rescan_dir(sub, dirs, files):
+                    yield event
+
+    def _try_watched_load(self, f, version):
+        LOG.debug("Now loading %s", f)
+        try:
+            return _load_file(f, f, version, self._cache)
+        except yaml.YAMLError:
+            LOG.error("%s FAILED loading because of Syntax error, Skip for now", f)
+        except ValidationError as e:
+            LOG.error("%s FAILED schema validation:\n%s\nSkip for now", f, e)
+        except (OSError, ValueError) as e:
+            LOG.error("%s FAILED loading:\n%s\nSkip for now", f, e)
+        return None
+
+    def _load_all(self, previous=None, workers=None):
+        """Load all config files, reusing configs from ``previous`` whose file
+        didn't change. Return a {(file, version): (state, config)} mapping.
+
+        The fingerprint of the files as they were loaded, including files
+        which failed to load, is kept for :meth:`snapshot`.
+        """
+        states = {}
+        loaded = {
+            key: (state, config)
+            for key, state, config in self._iter_loaded(
+                previous, workers, states=states
+            )
+        }
+        self._loaded_fingerprint = fingerprint(
+            (f, state) for f, state in states.items() if state
+        )
+        return loaded
+
+    def _iter_loaded(
+        self, previous=None, workers=None, ordered=True, on_error=None, states=None
+    ):
+        """Load all config files, reusing configs from ``previous`` whose file
+        didn't change. Yield a ((file, version), state, config) tuple for every
+        loaded config. States of all files are stored in ``states`` if given.
+        """
+        previous = previous or {}
+        states = {} if states is None else states
+        jobs = []
+        # [((file, version), state, config)], config is None if not loaded yet
 
         for version, files in self._ver_files_map.items():
             for f in files:
-                LOG.debug("Now loading %s", f)
-                try:
-                    ubi_configs.append(self.load(f, version))
-                except yaml.YAMLError:
-                    LOG.error(
-                        "%s FAILED loading because of Syntax error, Skip for now", f
-                    )
-                    continue
-                except ValidationError as e:
-                    LOG.error("%s FAILED schema validation:\n%s\nSkip for now", f, e)
-                    continue
+                state = states[f] = _file_state(f)
+                old = previous.get((f, version))
+                config = old[1] if old and old[0] == state else None
+                jobs.append(((f, version), state, config))
+
+        todo = [i for i, (_, _, config) in enumerate(jobs) if config is None]
+        reused = (
+            (i, (config, None))
+            for i, (_, _, config) in enumerate(jobs)
+            if config is not None
+        )
 
-        self._isroot = False
-        # restore _isroot so the loader can be used again.
+        executor = None
+        if workers and workers > 1 and len(todo) > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            futures = {
+                executor.submit(_try_load_file_in_worker, *jobs[i][0], self._cache): i
+                for i in todo
+            }
+            loaded = (
+                (futures[f], _worker_result(f.result())) for f in as_completed(futures)
+            )
+        else:
+            # loaded lazily, one by one
+            futures = {}
+            loaded = ((i, _try_load_file(*jobs[i][0], self._cache)) for i in todo)
 
-        return ubi_configs
+        try:
+            results = itertools.chain(reused, loaded)
+            for i, (config, error) in ordered_results(results, ordered):
+                (f, version), state, _ = jobs[i]
+                if error is not None:
+                    _report_error(f, version, error, on_error)
+                    continue
+                yield (f, version), state, config
+        finally:
+            if executor:
+                for future in futures:
+                    future.cancel()
+                executor.shutdown()
 
     def _get_local_files_map(self):
         """Get the config file list from local."""
         LOG.info("Getting the local config file list")
         ver_files_map = {}
-        for root, _, files in os.walk(self._path):
-            conf_files = [
-                os.path.join(root, f) for f in files if f.endswith((".yaml", ".yml"))
-            ]
-            if conf_files:
-                # if there's yaml files, then it must under some version directory
-                version = os.path.basename(os.path.abspath(root))
+        for _, version, conf_files in _scan_dirs(self._path, self._versions):
+            if version and conf_files:
                 ver_files_map.setdefault(version, []).extend(conf_files)
                 # the result map is as {'version': ['file1', 'file2', ..]}
 
         return ver_files_map
+
+
+def _dir_version(path, versions):
+    """Return a (scan, version) tuple for the directory.
+
+    Config files are only looked for in version directories, i.e. those named
+    in format '<PREFIX><MAJOR_VERSION>[.<MINOR_VERSION>]', version is None for
+    other directories. Directories of versions not matching ``versions`` globs
+    are not scanned at all.
+    """
+    name = os.path.basename(os.path.abspath(path))
+    if not re.match(PREFIX_VERSION_RE, name):
+        return True, None
+    if versions and not any(fnmatch.fnmatchcase(name, v) for v in versions):
+        return False, None
+    return True, name
+
+
+def _scan_dirs(path, versions):
+    """Walk the directory tree top-down, yielding a (directory, version,
+    config_files) tuple for every scanned directory.
+    """
+    scan, version = _dir_version(path, versions)
+    if not scan:
+        return
+
+    conf_files = []
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    # skip VCS metadata and other hidden directories
+                    if not entry.name.startswith("."):
+                        subdirs.append(entry.path)
+                elif version and entry.name.endswith((".yaml", ".yml")):
+                    conf_files.append(entry.path)
+    except OSError:
+        return
+
+    yield path, version, conf_files
+    for sub in subdirs:
+        for item in _scan_dirs(sub, versions):
+            yield item
+
+
+def _file_state(path):
+    """Return (mtime, size) of the file or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _load_file(file_path, file_name, version, cache=None):
+    match = re.match(PREFIX_VERSION_RE, version)
+
+    if not match:
+        raise ValueError(
+            f"Expected directories named in format '<PREFIX><MAJOR_VERSION>[.<MINOR_VERSION>]', but got {version}"
+        )
+    prefix = match.group("prefix")
+
+    LOG.info("Loading configuration file locally: %s", file_path)
+
+    if cache is None:
+        with open(file_path, "r") as f:
+            config_dict = load_config_dict(f)
+    else:
+        config_dict = _load_cached_dict(file_path, cache)
+
+    return UbiConfig.load_from_dict(config_dict, file_name, version.lstrip(prefix))
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_digest():
+    """Return a hash of the config schema the cached configs are validated
+    against.
+    """
+    with open(DEFAULT_SCHEMA, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _load_cached_dict(file_path, cache):
+    """Return the validated dictionary of the config file.
+
+    The dictionary is restored from the cache if the file didn't change since
+    it was cached, as determined by its modification time and size (and
+    content hash if ``UBICONFIG_CACHE_VERIFY_HASH`` is enabled). Entries are
+    keyed also by the schema, so configs are validated again when it changes.
+    """
+    key = FileCache.make_key(_schema_digest(), os.path.abspath(file_path))
+    st = os.stat(file_path)
+
+    raw = cache.get(key)
+    if raw is not None:
+        entry = json.loads(raw.decode("utf-8"))
+        if entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            if not CACHE_VERIFY_HASH:
+                return entry["data"]
+            with open(file_path, "rb") as f:
+                if hashlib.sha256(f.read()).hexdigest() == entry["sha256"]:
+                    return entry["data"]
+
+    with open(file_path, "rb") as f:
+        content = f.read()
+    config_dict = load_config_dict(content)
+
+    entry = {
+        "mtime": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "data": config_dict,
+    }
+    cache.put(key, json.dumps(entry).encode("utf-8"))
+
+    return config_dict
+
+
+def _try_load_file(file_path, version, cache=None):
+    """Load a config file for load_all.
+
+    Return a (config, error) tuple, where error is None or the exception
+    raised for invalid YAML or invalid config.
+    """
+    LOG.debug("Now loading %s", file_path)
+    try:
+        return _load_file(file_path, file_path, version, cache), None
+    except (yaml.YAMLError, ValidationError) as e:
+        return None, e
+
+
+def _try_load_file_in_worker(file_path, version, cache=None):
+    """Load a config file for load_all in a worker process.
+
+    Return a (config, error) tuple, where error is None or a (kind, message)
+    tuple, kind is "syntax" for invalid YAML or "validation" for invalid config.
+    """
+    config, error = _try_load_file(file_path, version, cache)
+    if error is None:
+        return config, None
+    # pass only the message, exceptions may not survive pickling
+    kind = "syntax" if isinstance(error, yaml.YAMLError) else "validation"
+    return None, (kind, str(error))
+
+
+def _worker_result(result):
+    """Turn a result of :func:`_try_load_file_in_worker` into a result of
+    :func:`_try_load_file`.
+    """
+    config, error = result
+    if error is not None:
+        kind, message = error
+        error = (
+            yaml.YAMLError(message) if kind == "syntax" else ValidationError(message)
+        )
+    return config, error
+
+
+def _report_error(file_path, version, error, on_error=None):
+    """Log the exception of an invalid config file or pass it to the
+    ``on_error`` callback.
+    """
+    if on_error is not None:
+        on_error(file_path, version, error)
+    elif isinstance(error, yaml.YAMLError):
+        LOG.error("%s FAILED loading because of Syntax error, Skip for now", file_path)
+    else:
+        LOG.error("%s FAILED schema validation:\n%s\nSkip for now", file_path, error)
+
+
+def _changed_dirs(dirs, files):
+    """Return directories whose files changed since the known state."""
+    dirty = set()
+    for d, mtime in dirs.items():
+        # files were added or removed in the directory
+        if _dir_mtime(d) != mtime:
+            dirty.add(d)
+    for f, state in files.items():
+        if _file_state(f) != state:
+            dirty.add(os.path.dirname(f))
+    return dirty
+
+
+def _add_watches(inotify, watches, dirs):
+    """Add inotify watches for directories which aren't watched yet."""
+    flags = inotify_simple.flags
+    mask = (
+        flags.CREATE
+        | flags.DELETE
+        | flags.CLOSE_WRITE
+        | flags.MOVED_FROM
+        | flags.MOVED_TO
+        | flags.DELETE_SELF
+    )
+    watched = set(watches.values())
+    for d in dirs:
+        if d not in watched:
+            try:
+                watches[inotify.add_watch(d, mask)] = d
+            except OSError:
+                continue
+
+
+def _dir_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
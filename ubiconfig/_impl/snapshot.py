@@ -0,0 +1,84 @@
+import pickle
+import struct
+import time
+import zlib
+
+from .files import _atomic_write
+
+MAGIC = b"UBICFGSNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("!10sH")
+# pickle protocol readable by all supported Python versions
+PICKLE_PROTOCOL = 4
+
+
+class Snapshot(object):
+    """Configs restored by :func:`~ubiconfig.load_snapshot`."""
+
+    def __init__(self, configs, sources, fingerprint, source, created):
+        """
+        Args:
+            configs(list): :class:`~ubiconfig.UbiConfig` objects, in the order
+                returned by ``load_all`` of the loader
+            sources(dict): ``{(file_name, version): source}`` mapping of the
+                configs, where source is the blob or commit id for GitLab and
+                (mtime, size) of the file for local directories
+            fingerprint(str): fingerprint of the loader when the snapshot was
+                created, see :meth:`~ubiconfig.Loader.fingerprint`
+            source(str): URL or path the configs were loaded from
+            created(float): creation time of the snapshot as a UNIX timestamp
+        """
+        self.configs = configs
+        self.sources = sources
+        self.fingerprint = fingerprint
+        self.source = source
+        self.created = created
+
+    def __repr__(self):
+        return "<Snapshot: %s configs from %s>" % (len(self.configs), self.source)
+
+
+def write_snapshot(path, loaded, fingerprint, source):
+    """Write configs of a ``{key: (source, config)}`` mapping, as kept by the
+    loaders, to a snapshot file.
+
+    The file is written atomically, so workers never read a partial snapshot.
+    """
+    data = {
+        "entries": [(key, src, config) for key, (src, config) in loaded.items()],
+        "fingerprint": fingerprint,
+        "source": source,
+        "created": time.time(),
+    }
+    payload = zlib.compress(pickle.dumps(data, protocol=PICKLE_PROTOCOL))
+
+    _atomic_write(path, [HEADER.pack(MAGIC, FORMAT_VERSION), payload])
+
+
+def load_snapshot(path):
+    """Restore configs from a snapshot written by ``snapshot`` method of
+    a loader and return a :class:`Snapshot` object.
+
+    Configs aren't parsed or validated again and nothing is requested over
+    network. Snapshots contain pickled objects, only load snapshots from
+    trusted sources.
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) != HEADER.size or header[: len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not a ubiconfig snapshot" % path)
+        _, version = HEADER.unpack(header)
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                "Unsupported snapshot format version %s of %s, expected %s"
+                % (version, path, FORMAT_VERSION)
+            )
+        data = pickle.loads(zlib.decompress(f.read()))
+
+    return Snapshot(
+        configs=[config for _, _, config in data["entries"]],
+        sources=dict((key, src) for key, src, _ in data["entries"]),
+        fingerprint=data["fingerprint"],
+        source=data["source"],
+        created=data["created"],
+    )
@@ -1,10 +1,12 @@
+from .base import ValueObject
 from .content_sets import ContentSetsMapping
+from .diff import ConfigDiff
 from .flags import Flags
 from .modules import Modules
 from .packages import Packages
 
 
-class UbiConfig(object):
+class UbiConfig(ValueObject):
     """Wrap all UBI related configurations
     Examples to access different configurations:
 
@@ -17,6 +19,8 @@ class UbiConfig(object):
       config.content_sets.rpm.input
       config.content_sets.debuginfo.output"""
 
+    __slots__ = ("content_sets", "packages", "modules", "file_name", "version", "flags")
+
     def __init__(self, cs, pkgs, mds, file_name, version, flags):
         """
         :param cs: :class:`~ubiconfig.config_types.content_sets.ContentSetsMapping`
@@ -35,8 +39,50 @@ class UbiConfig(object):
     def __repr__(self):
         return self.file_name
 
+    def _key(self):
+        return (
+            self.file_name,
+            self.version,
+            self.content_sets,
+            self.packages,
+            self.modules,
+            self.flags,
+        )
+
+    def export_dict(self):
+        """Return the config as a dictionary in format accepted by
+        :meth:`load_from_dict`, so that
+        ``UbiConfig.load_from_dict(config.export_dict(), config.file_name,
+        config.version)`` is equal to the config.
+
+        Content set mappings with empty input and output are left out.
+        """
+        mappings = [
+            self.content_sets.rpm,
+            self.content_sets.srpm,
+            self.content_sets.debuginfo,
+        ]
+        return {
+            "content_sets": dict(
+                (m.type, m.export_dict()) for m in mappings if m.input or m.output
+            ),
+            "packages": self.packages.export_dict(),
+            "arches": list(self.packages.arches),
+            "modules": self.modules.export_dict(),
+            "flags": self.flags.export_dict(),
+        }
+
+    def diff(self, other):
+        """Compare the config with another, newer, config.
+
+        Return a :class:`~ubiconfig.config_types.diff.ConfigDiff` object with
+        packages, blacklist entries, modules, flags and content set mappings
+        added in ``other`` or removed from it.
+        """
+        return ConfigDiff.between(self, other)
+
     @classmethod
-    def load_from_dict(cls, data, file_name, version=None):
+    def load_from_dict(cls, data, file_name, version=None, interner=None):
         """Create new instance of UbiConfig and load it from provided dictonary with
         following format:
 
@@ -52,6 +98,9 @@ class UbiConfig(object):
                 "content_sets": {},
             }
 
+        If an :class:`~ubiconfig.config_types.interner.Interner` is given, equal
+        parts of configs loaded with it are shared.
+
         See also :meth:`ubiconfig.config_types.content_sets.ContentSetsMapping.load_from_dict`
         :meth:`ubiconfig.config_types.modules.Modules.load_from_dict`
         """
@@ -66,7 +115,7 @@ class UbiConfig(object):
         # use the simplified file name
         file_name = file_name.split("/")[-1]
 
-        return cls(
+        config = cls(
             cs=cs_map,
             pkgs=pkgs_data,
             mds=m_data,
@@ -74,3 +123,7 @@ class UbiConfig(object):
             version=version,
             flags=flags,
         )
+        if interner is not None:
+            config = interner.config(config)
+
+        return config
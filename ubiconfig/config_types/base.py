@@ -0,0 +1,26 @@
+"""Common base of the config types"""
+
+
+class ValueObject(object):
+    """Base of config types which are equal when their values are equal.
+
+    Subclasses define ``_key`` returning a hashable tuple of their values.
+    Objects of different classes are never equal.
+    """
+
+    __slots__ = ()
+
+    def _key(self):
+        raise NotImplementedError()
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self._key())
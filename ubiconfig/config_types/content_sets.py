@@ -1,15 +1,28 @@
 """This module abstracts the 'content_sets' mappings"""
 
+from .base import ValueObject
+
+
+class ContentSetMapping(ValueObject):
+    __slots__ = ("input", "output")
 
-class ContentSetMapping(object):
     def __init__(self, input_content, output_content):
         self.input = input_content
         self.output = output_content
 
+    def _key(self):
+        return (self.input, self.output)
+
+    def export_dict(self):
+        """Return a dictionary such as {"input": input, "output": output}"""
+        return {"input": self.input, "output": self.output}
+
 
 class Rpm(ContentSetMapping):
     """Input-output rpm content sets mapping"""
 
+    __slots__ = ()
+
     @property
     def type(self):
         return "rpm"
@@ -18,6 +31,8 @@ class Rpm(ContentSetMapping):
 class Srpm(ContentSetMapping):
     """Input-output srpm content sets mapping"""
 
+    __slots__ = ()
+
     @property
     def type(self):
         return "srpm"
@@ -26,12 +41,16 @@ class Srpm(ContentSetMapping):
 class Debuginfo(ContentSetMapping):
     """Input-output debuginfo content sets mapping"""
 
+    __slots__ = ()
+
     @property
     def type(self):
         return "debuginfo"
 
 
-class ContentSetsMapping(object):
+class ContentSetsMapping(ValueObject):
+    __slots__ = ("rpm", "srpm", "debuginfo")
+
     def __init__(self, rpm, srpm, debuginfo):
         """
         Args:
@@ -43,6 +62,9 @@ class ContentSetsMapping(object):
         self.srpm = srpm
         self.debuginfo = debuginfo
 
+    def _key(self):
+        return (self.rpm, self.srpm, self.debuginfo)
+
     @classmethod
     def load_from_dict(cls, data):
         """Create instances of :class:`ContentSetsMapping` from a dictionary
@@ -0,0 +1,93 @@
+"""This module compares configs"""
+
+
+class Changes(object):
+    """Items added to and removed from a part of a config."""
+
+    __slots__ = ("added", "removed")
+
+    def __init__(self, added, removed):
+        """
+        Args:
+            added(list): items only in the new config
+            removed(list): items only in the old config
+        """
+        self.added = added
+        self.removed = removed
+
+    def __bool__(self):
+        return bool(self.added or self.removed)
+
+    def __repr__(self):
+        return "<Changes: %s added, %s removed>" % (len(self.added), len(self.removed))
+
+    @classmethod
+    def between(cls, old, new):
+        """Create :class:`Changes` of two lists of hashable items, the order of
+        items in the lists is kept.
+        """
+        old_set, new_set = set(old), set(new)
+        return cls(
+            [item for item in new if item not in old_set],
+            [item for item in old if item not in new_set],
+        )
+
+
+class ConfigDiff(object):
+    """Differences between two :class:`~ubiconfig.UbiConfig` objects returned
+    by :meth:`~ubiconfig.UbiConfig.diff`.
+
+    Every attribute is a :class:`Changes` object:
+
+    - ``packages``: :class:`~ubiconfig.config_types.packages.IncludePackage`
+      objects of the whitelist
+    - ``blacklist``: :class:`~ubiconfig.config_types.packages.ExcludePackage`
+      objects of the blacklist
+    - ``modules``: :class:`~ubiconfig.config_types.modules.Module` objects
+    - ``flags``: :class:`~ubiconfig.config_types.flags.Flag` objects, a flag
+      whose value changed is both removed and added
+    - ``content_sets``: :class:`~ubiconfig.config_types.content_sets.Rpm`,
+      :class:`~ubiconfig.config_types.content_sets.Srpm` and
+      :class:`~ubiconfig.config_types.content_sets.Debuginfo` mappings, a
+      changed mapping is both removed and added
+    """
+
+    FIELDS = ("packages", "blacklist", "modules", "flags", "content_sets")
+
+    __slots__ = FIELDS
+
+    def __init__(self, packages, blacklist, modules, flags, content_sets):
+        self.packages = packages
+        self.blacklist = blacklist
+        self.modules = modules
+        self.flags = flags
+        self.content_sets = content_sets
+
+    def __bool__(self):
+        return any(getattr(self, field) for field in self.FIELDS)
+
+    def __repr__(self):
+        return "<ConfigDiff: %s>" % ", ".join(
+            "%s +%s -%s" % (field, len(changes.added), len(changes.removed))
+            for field, changes in ((f, getattr(self, f)) for f in self.FIELDS)
+            if changes
+        )
+
+    @classmethod
+    def between(cls, old, new):
+        """Create :class:`ConfigDiff` of two :class:`~ubiconfig.UbiConfig`
+        objects.
+        """
+
+        def mappings(cs):
+            return [cs.rpm, cs.srpm, cs.debuginfo]
+
+        return cls(
+            packages=Changes.between(old.packages.whitelist, new.packages.whitelist),
+            blacklist=Changes.between(old.packages.blacklist, new.packages.blacklist),
+            modules=Changes.between(old.modules.whitelist, new.modules.whitelist),
+            flags=Changes.between(list(old.flags), list(new.flags)),
+            content_sets=Changes.between(
+                mappings(old.content_sets), mappings(new.content_sets)
+            ),
+        )
@@ -1,12 +1,22 @@
-class Flag:
+from .base import ValueObject
+
+
+class Flag(ValueObject):
+    __slots__ = ("name", "value")
+
     def __init__(self, name, value):
         self.name = name
         self.value = _str_to_bool(value)
 
+    def _key(self):
+        return (self.name, self.value)
+
 
-class Flags(object):
+class Flags(ValueObject):
     """group of modules"""
 
+    __slots__ = ("_flags",)
+
     def __init__(self, flags):
         """
         Args:
@@ -15,14 +25,28 @@ class Flags(object):
         self._flags = flags
 
     def __getattr__(self, name):
-        # allow getting flags as object attrs
+        # allow getting flags as object attrs; private and special names are
+        # never flags (this also keeps pickle from recursing here)
+        if name.startswith("_"):
+            raise AttributeError(name)
         for item in self._flags:
             if item.name == name:
                 return item
 
+    def __iter__(self):
+        return iter(self._flags)
+
+    def _key(self):
+        # the order of flags doesn't matter
+        return frozenset(self._flags)
+
     def as_dict(self):
         return {item.name: item.value for item in self._flags}
 
+    def export_dict(self):
+        """Return a dictionary in format accepted by :meth:`load_from_dict`"""
+        return self.as_dict()
+
     @classmethod
     def load_from_dict(cls, data):
         """Create instances of :class:`Flags` from a dictionary
@@ -0,0 +1,104 @@
+"""This module shares equal parts of configs loaded from many versions"""
+
+from .flags import Flags
+from .modules import Modules
+
+
+class Interner(object):
+    """Deduplicate equal strings and reuse equal config objects across configs.
+
+    Configs of minor versions usually carry the same package and module lists,
+    an interner keeps a single copy of them:
+
+    .. code-block:: python
+
+        >>> interner = Interner()
+        >>> configs = [interner.config(c) for c in configs]
+
+    Shared objects are reused by all configs passed to the same interner,
+    so they must not be modified afterwards.
+    """
+
+    def __init__(self):
+        self._strings = {}
+        self._objects = {}
+        # {key: object}, keys of groups use ids of the shared objects in them
+
+    def string(self, value):
+        """Return a shared copy of the string, other values are returned as is."""
+        if not isinstance(value, str):
+            return value
+        return self._strings.setdefault(value, value)
+
+    def config(self, config):
+        """Replace parts of the :class:`~ubiconfig.UbiConfig` by equal shared
+        objects in place and return it.
+        """
+        config.file_name = self.string(config.file_name)
+        config.version = self.string(config.version)
+        config.content_sets = self._content_sets(config.content_sets)
+        config.packages = self._packages(config.packages)
+        config.modules = self._modules(config.modules)
+        config.flags = self._flags(config.flags)
+        return config
+
+    def _shared(self, key, obj):
+        return self._objects.setdefault(key, obj)
+
+    def _content_sets(self, cs):
+        mappings = (cs.rpm, cs.srpm, cs.debuginfo)
+        key = ("content_sets",) + tuple((m.input, m.output) for m in mappings)
+        if key not in self._objects:
+            for mapping in mappings:
+                mapping.input = self.string(mapping.input)
+                mapping.output = self.string(mapping.output)
+        return self._shared(key, cs)
+
+    def _package(self, pkg):
+        key = ("package", type(pkg), pkg.package, pkg.name, pkg.arch)
+        if key not in self._objects:
+            pkg.package = self.string(pkg.package)
+            pkg.name = self.string(pkg.name)
+            pkg.arch = self.string(pkg.arch)
+        return self._shared(key, pkg)
+
+    def _packages(self, pkgs):
+        whitelist = [self._package(pkg) for pkg in pkgs.whitelist]
+        blacklist = [self._package(pkg) for pkg in pkgs.blacklist]
+        key = (
+            "packages",
+            tuple(id(pkg) for pkg in whitelist),
+            tuple(id(pkg) for pkg in blacklist),
+            tuple(pkgs.arches),
+        )
+        if key not in self._objects:
+            pkgs.whitelist, pkgs.blacklist = whitelist, blacklist
+            pkgs.arches = [self.string(arch) for arch in pkgs.arches]
+        return self._shared(key, pkgs)
+
+    def _module(self, module):
+        profiles = tuple(module.profiles) if module.profiles is not None else None
+        key = ("module", module.name, module.stream, profiles)
+        if key not in self._objects:
+            module.name = self.string(module.name)
+            module.stream = self.string(module.stream)
+            if module.profiles is not None:
+                module.profiles = [self.string(p) for p in module.profiles]
+        return self._shared(key, module)
+
+    def _modules(self, modules):
+        whitelist = [self._module(module) for module in modules.whitelist]
+        key = ("modules", tuple(id(module) for module in whitelist))
+        if key not in self._objects:
+            # the lookup index of modules is built from the whitelist
+            modules = Modules(whitelist)
+        return self._shared(key, modules)
+
+    def _flags(self, flags):
+        items = flags.as_dict()
+        key = ("flags", tuple(sorted((k, repr(v)) for k, v in items.items())))
+        if key not in self._objects:
+            flags = Flags.load_from_dict(
+                dict((self.string(k), self.string(v)) for k, v in items.items())
+            )
+        return self._shared(key, flags)
@@ -1,9 +1,13 @@
 """This module abstract the 'modules' content type"""
 
+from .base import ValueObject
 
-class Module(object):
+
+class Module(ValueObject):
     """Define a single module"""
 
+    __slots__ = ("name", "stream", "profiles")
+
     def __init__(self, name, stream, profiles=None):
         self.name = name
         self.stream = str(stream)
@@ -12,20 +16,76 @@ class Module(object):
     def __repr__(self):
         return "<Module: %s>" % self.name
 
+    def _key(self):
+        profiles = tuple(self.profiles) if self.profiles is not None else None
+        return (self.name, self.stream, profiles)
+
+    def export_dict(self):
+        """Return a dictionary in format accepted by :meth:`Modules.load_from_dict`"""
+        out = {"name": self.name, "stream": self.stream}
+        if self.profiles is not None:
+            out["profiles"] = list(self.profiles)
+        return out
+
 
-class Modules(object):
+class Modules(ValueObject):
     """group of modules"""
 
+    __slots__ = ("whitelist", "_streams", "_profiles")
+
     def __init__(self, include):
         """
         Args:
             include(list): a list of :class:`Module` instances
+
+        Modules are indexed by name and stream when the instance is created,
+        the index doesn't reflect later changes of :attr:`whitelist`.
         """
         self.whitelist = include
+        self._streams = {}
+        # {name: [stream, ...]}
+        self._profiles = {}
+        # {(name, stream): set(profiles)}, None if all profiles are included
+
+        for module in include:
+            streams = self._streams.setdefault(module.name, [])
+            if module.stream not in streams:
+                streams.append(module.stream)
+
+            key = (module.name, module.stream)
+            if not module.profiles:
+                self._profiles[key] = None
+            elif key not in self._profiles:
+                self._profiles[key] = set(module.profiles)
+            elif self._profiles[key] is not None:
+                self._profiles[key].update(module.profiles)
 
     def __getitem__(self, index):
         return self.whitelist[index]
 
+    def _key(self):
+        return tuple(self.whitelist)
+
+    def export_dict(self):
+        """Return a dictionary in format accepted by :meth:`load_from_dict`"""
+        return {"include": [module.export_dict() for module in self.whitelist]}
+
+    def contains(self, name, stream, profile=None):
+        """Return True if the module stream is in the whitelist.
+
+        If profile is given, the module stream must also include the profile;
+        a module listed without profiles includes all of them.
+        """
+        key = (name, str(stream))
+        if key not in self._profiles:
+            return False
+        profiles = self._profiles[key]
+        return profile is None or profiles is None or profile in profiles
+
+    def streams_for(self, name):
+        """Return a list of whitelisted streams of the module."""
+        return list(self._streams.get(name, []))
+
     @classmethod
     def load_from_dict(cls, data):
         """Create instances of :class:`Modules` from a dictionary
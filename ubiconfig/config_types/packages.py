@@ -1,22 +1,42 @@
 """This module abstract the 'packages' content type"""
 
+import re
+
+from .base import ValueObject
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class Package(ValueObject):
+    __slots__ = ("package", "name", "arch")
 
-class Package(object):
     def __init__(self, package, arches):
+        """
+        Args:
+            package(str): package name, optionally followed by ``.<arch>``
+            arches(frozenset): known arches, used to tell the arch suffix from
+                a dot in the package name
+        """
         self.package = package
+        self.name, self.arch = package, None
         if "." in package:
             name, arch = package.rsplit(".", 1)
-            if arch in arches or arch == "*":
+            if arch == "*" or arch in arches:
                 self.name, self.arch = name, arch
-        if not hasattr(self, "name"):
-            self.name = package
-            self.arch = None
 
     def __repr__(self):
         return "<Package: %s>" % self.package
 
+    def _key(self):
+        return (self.package, self.name, self.arch)
+
 
 class IncludePackage(Package):
+    __slots__ = ()
+
     def __init__(self, package, arches):
         super(IncludePackage, self).__init__(package, arches)
         if "*" in self.name:
@@ -24,10 +44,12 @@ class IncludePackage(Package):
 
 
 class ExcludePackage(Package):
-    pass
+    __slots__ = ()
 
 
-class Packages(object):
+class Packages(ValueObject):
+    __slots__ = ("whitelist", "blacklist", "arches")
+
     def __init__(self, include, exclude, arches):
         """
         Args:
@@ -35,8 +57,243 @@ class Packages(object):
             exclude(list): list of packages to blacklist
             arches(list): list of arches of packages in whitelist and blacklist
         """
+        self.arches = list(arches)
+        arches = frozenset(arches)
         self.whitelist, self.blacklist = [], []
         for package in include:
             self.whitelist.append(IncludePackage(package, arches))
         for package in exclude:
             self.blacklist.append(ExcludePackage(package, arches))
+
+    def _key(self):
+        return (tuple(self.whitelist), tuple(self.blacklist), tuple(self.arches))
+
+    def export_dict(self):
+        """Return a dictionary such as {"include": [...], "exclude": [...]},
+        arches are available as :attr:`arches`.
+        """
+        return {
+            "include": [pkg.package for pkg in self.whitelist],
+            "exclude": [pkg.package for pkg in self.blacklist],
+        }
+
+    def matcher(self):
+        """Return a :class:`PackageMatcher` for the whitelist and blacklist.
+
+        Building the matcher takes time proportional to the size of the lists,
+        so it should be done once and reused for all packages.
+        """
+        return PackageMatcher(self.whitelist, self.blacklist)
+
+    def masks(self, names, arches=None):
+        """Return a tuple of (included, excluded) boolean masks for packages
+        given as parallel sequences of names and arches.
+
+        A new matcher is built on every call, use :meth:`matcher` to match
+        packages repeatedly. See :meth:`PackageMatcher.masks`.
+        """
+        return self.matcher().masks(names, arches)
+
+
+class PackageMatcher(object):
+    """Match packages against whitelist and blacklist of :class:`Packages` in
+    near-constant time.
+
+    Exact names are kept in hash sets (per arch for ``<name>.<arch>``
+    entries) and all ``*`` globs are compiled into a single regular
+    expression. A package entry without arch, or with ``*`` arch, matches
+    packages of any arch.
+    """
+
+    __slots__ = ("_included", "_excluded")
+
+    def __init__(self, whitelist, blacklist):
+        """
+        Args:
+            whitelist(list): list of :class:`IncludePackage`
+            blacklist(list): list of :class:`ExcludePackage`
+        """
+        self._included = _CompiledPackages(whitelist)
+        self._excluded = _CompiledPackages(blacklist)
+
+    def is_included(self, name, arch=None):
+        """Return True if the package matches the whitelist.
+
+        Args:
+            name(str): package name
+            arch(str): package arch, if None, only entries for any arch match
+        """
+        return self._included.matches(name, arch)
+
+    def is_excluded(self, name, arch=None):
+        """Return True if the package matches the blacklist.
+
+        Args:
+            name(str): package name
+            arch(str): package arch, if None, only entries for any arch match
+        """
+        return self._excluded.matches(name, arch)
+
+    def masks(self, names, arches=None):
+        """Match many packages at once, return a tuple of (included, excluded)
+        boolean masks, as :meth:`is_included` and :meth:`is_excluded` would.
+
+        All distinct names, and ``<name>.<arch>`` of distinct packages, are
+        matched against the globs by a single regular expression search. If
+        names are given as a NumPy array, the masks are NumPy boolean arrays,
+        lists otherwise.
+
+        Args:
+            names(list): package names
+            arches(list): package arches parallel to names, or None
+        """
+        as_array = numpy is not None and isinstance(names, numpy.ndarray)
+        names = names.tolist() if as_array else list(names)
+        packages = None
+        if arches is not None:
+            arches = arches.tolist() if hasattr(arches, "tolist") else list(arches)
+            if len(arches) != len(names):
+                raise ValueError(
+                    "Expected %s arches, got %s" % (len(names), len(arches))
+                )
+            if self._included.has_arch_entries or self._excluded.has_arch_entries:
+                packages = [
+                    name + "." + arch if arch else None
+                    for name, arch in zip(names, arches)
+                ]
+
+        distinct = _Distinct(names), _Distinct(packages or ())
+        included = self._included.mask(names, packages, *distinct)
+        excluded = self._excluded.mask(names, packages, *distinct)
+        if as_array:
+            return (
+                numpy.fromiter(included, dtype=bool, count=len(included)),
+                numpy.fromiter(excluded, dtype=bool, count=len(excluded)),
+            )
+        return included, excluded
+
+
+class _CompiledPackages(object):
+    __slots__ = (
+        "names",
+        "arch_names",
+        "arch_packages",
+        "name_regex",
+        "arch_regex",
+        "name_lines_regex",
+        "arch_lines_regex",
+    )
+
+    def __init__(self, packages):
+        self.names = set()
+        # names of packages of any arch
+        self.arch_names = {}
+        # {arch: set(names)}
+        self.arch_packages = set()
+        # "<name>.<arch>" of packages of an arch
+        name_patterns = []
+        # globs of packages of any arch, matched against the name
+        arch_patterns = []
+        # globs of packages of an arch, matched against "<name>.<arch>"
+
+        for pkg in packages:
+            arch = None if pkg.arch == "*" else pkg.arch
+            if "*" in pkg.name:
+                pattern = ".*".join(re.escape(part) for part in pkg.name.split("*"))
+                if arch:
+                    arch_patterns.append("%s\\.%s" % (pattern, re.escape(arch)))
+                else:
+                    name_patterns.append(pattern)
+            elif arch:
+                self.arch_names.setdefault(arch, set()).add(pkg.name)
+                self.arch_packages.add("%s.%s" % (pkg.name, arch))
+            else:
+                self.names.add(pkg.name)
+
+        self.name_regex = _compile(name_patterns)
+        self.arch_regex = _compile(arch_patterns)
+        self.name_lines_regex = _compile_lines(name_patterns)
+        self.arch_lines_regex = _compile_lines(arch_patterns)
+
+    @property
+    def has_arch_entries(self):
+        return bool(self.arch_packages or self.arch_regex)
+
+    def matches(self, name, arch=None):
+        return self.name_matches(name) or bool(arch and self.arch_matches(name, arch))
+
+    def name_matches(self, name):
+        """Match entries of any arch, the result doesn't depend on arch."""
+        if name in self.names:
+            return True
+        return bool(self.name_regex and self.name_regex.fullmatch(name))
+
+    def arch_matches(self, name, arch):
+        """Match entries of the given arch only."""
+        if name in self.arch_names.get(arch, ()):
+            return True
+        return bool(
+            self.arch_regex and self.arch_regex.fullmatch("%s.%s" % (name, arch))
+        )
+
+    def mask(self, names, packages, distinct_names, distinct_packages):
+        """Return a mask for names and parallel "<name>.<arch>" of packages
+        (None for packages without arch, or None if arches aren't known).
+        """
+        matched = distinct_names.matching(
+            self.names, self.name_regex, self.name_lines_regex
+        )
+        mask = [name in matched for name in names]
+
+        if packages is not None and self.has_arch_entries:
+            matched = distinct_packages.matching(
+                self.arch_packages, self.arch_regex, self.arch_lines_regex
+            )
+            mask = [m or pkg in matched for m, pkg in zip(mask, packages)]
+
+        return mask
+
+
+class _Distinct(object):
+    """Distinct strings, searched by regular expressions all at once."""
+
+    __slots__ = ("strings", "_text", "_multiline")
+
+    def __init__(self, strings):
+        self.strings = set(strings)
+        self.strings.discard(None)
+        self._text = None
+        self._multiline = ()
+        # strings with newlines, which can't be searched as lines
+
+    def matching(self, exact, regex, lines_regex):
+        """Return the subset of strings equal to one of exact strings or fully
+        matching the regex; ``lines_regex`` finds the same strings as lines of
+        a text, see :func:`_compile_lines`.
+        """
+        matched = exact.intersection(self.strings)
+        if regex is None:
+            return matched
+
+        if self._text is None:
+            self._text = "\n%s\n" % "\n".join(self.strings)
+            if self._text.count("\n") != len(self.strings) + 1:
+                self._multiline = [s for s in self.strings if "\n" in s]
+        found = set(lines_regex.findall(self._text))
+        found.difference_update(self._multiline)
+        found.update(s for s in self._multiline if regex.fullmatch(s))
+        return matched | found
+
+
+def _compile(patterns):
+    if not patterns:
+        return None
+    return re.compile("|".join("(?:%s)" % p for p in patterns), re.S)
+
+
+def _compile_lines(patterns):
+    # a regex finding whole lines of strings joined by newlines, "." doesn't
+    # match newlines
+    if not patterns:
+        return None
+    return re.compile("\n(%s)(?=\n)" % "|".join("(?:%s)" % p for p in patterns))
@@ -0,0 +1,51 @@
+"""Export of loaded UBI configs as newline-delimited JSON"""
+
+import json
+
+from ubiconfig._impl.loaders.base import Loader
+from ubiconfig.config_types import UbiConfig
+
+
+def export_ndjson(source, fp):
+    """Write configs to a text file object as newline-delimited JSON, one
+    config per line, and return the number of written configs.
+
+    ``source`` is a :class:`~ubiconfig.Loader`, whose configs are written as
+    soon as they're loaded by :meth:`~ubiconfig.Loader.iter_all`, or an
+    iterable of :class:`~ubiconfig.UbiConfig` objects. Each line is an object
+    such as:
+
+    .. code-block:: json
+
+        {"file_name": "<file_name>", "version": "<version>", "config": {}}
+
+    where config is the result of :meth:`~ubiconfig.UbiConfig.export_dict`.
+    """
+    configs = source.iter_all() if isinstance(source, Loader) else source
+    count = 0
+    for config in configs:
+        line = {
+            "file_name": config.file_name,
+            "version": config.version,
+            "config": config.export_dict(),
+        }
+        fp.write(json.dumps(line, separators=(",", ":")))
+        fp.write("\n")
+        count += 1
+    return count
+
+
+def load_ndjson(fp):
+    """Yield :class:`~ubiconfig.UbiConfig` objects from a text file object
+    written by :func:`export_ndjson`.
+
+    Configs were validated when they were loaded originally, so they're not
+    validated again.
+    """
+    for line in fp:
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        yield UbiConfig.load_from_dict(
+            data["config"], data["file_name"], data["version"]
+        )
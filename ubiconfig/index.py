@@ -0,0 +1,88 @@
+"""Fast lookups of loaded UBI configs"""
+
+CONTENT_SET_FIELDS = tuple(
+    "%s_%s" % (cs_type, direction)
+    for cs_type in ("rpm", "srpm", "debuginfo")
+    for direction in ("input", "output")
+)
+
+FIELDS = CONTENT_SET_FIELDS + ("file_name", "version")
+""" Fields which can be used in :meth:`ConfigIndex.find` """
+
+
+class ConfigIndex(object):
+    """An index of :class:`~ubiconfig.UbiConfig` objects by their content sets,
+    file name and version.
+
+    .. code-block:: python
+
+        >>> index = ConfigIndex(loader.load_all())
+        >>> index.find(rpm_input="rhel-7-server-rpms", version="7")
+        [rhel-7-server.yaml]
+    """
+
+    def __init__(self, configs):
+        """
+        Args:
+            configs(list): :class:`~ubiconfig.UbiConfig` objects to index
+        """
+        self.configs = list(configs)
+        self._indexes = dict((field, {}) for field in FIELDS)
+        # {field: {value: [position, ...]}}
+
+        for position, config in enumerate(self.configs):
+            for field in FIELDS:
+                value = _field_value(config, field)
+                self._indexes[field].setdefault(value, []).append(position)
+
+    def __len__(self):
+        return len(self.configs)
+
+    def __iter__(self):
+        return iter(self.configs)
+
+    def find(self, **criteria):
+        """Return a list of configs matching all given criteria, in the order
+        they were indexed.
+
+        Criteria are given as ``field=value`` pairs, where field is one of
+        ``rpm_input``, ``rpm_output``, ``srpm_input``, ``srpm_output``,
+        ``debuginfo_input``, ``debuginfo_output``, ``file_name`` or
+        ``version``. All configs are returned if no criteria are given.
+        """
+        unknown = sorted(set(criteria) - set(FIELDS))
+        if unknown:
+            raise ValueError(
+                "Unknown field(s) %s, expected some of %s"
+                % (", ".join(unknown), ", ".join(FIELDS))
+            )
+        if not criteria:
+            return list(self.configs)
+
+        matches = sorted(
+            (self._indexes[field].get(value, []) for field, value in criteria.items()),
+            key=len,
+        )
+        # start from the most selective field
+        positions = set(matches[0])
+        for other in matches[1:]:
+            if not positions:
+                break
+            positions.intersection_update(other)
+
+        return [self.configs[position] for position in sorted(positions)]
+
+    def find_one(self, **criteria):
+        """Return the first config matching all given criteria or None.
+
+        See :meth:`find` for supported criteria.
+        """
+        found = self.find(**criteria)
+        return found[0] if found else None
+
+
+def _field_value(config, field):
+    if field in CONTENT_SET_FIELDS:
+        cs_type, direction = field.split("_")
+        return getattr(getattr(config.content_sets, cs_type), direction)
+    return getattr(config, field)
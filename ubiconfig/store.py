@@ -0,0 +1,508 @@
+"""Read-only store of loaded UBI configs shared by many processes"""
+
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from ubiconfig._impl.files import _atomic_write
+from ubiconfig.config_types import UbiConfig
+from ubiconfig.config_types.content_sets import (
+    ContentSetsMapping,
+    Debuginfo,
+    Rpm,
+    Srpm,
+)
+from ubiconfig.config_types.flags import Flag
+from ubiconfig.config_types.modules import Module, Modules
+from ubiconfig.config_types.packages import PackageMatcher
+
+MAGIC = b"UBICFGSTORE\n"
+FORMAT_VERSION = 1
+# magic, format version, reserved, byte order marker, number of strings,
+# number of configs, number of data words
+HEADER = struct.Struct("=12sHHIIII")
+BYTE_ORDER_MARKER = 0x01020304
+NONE = 0xFFFFFFFF
+# stands for None in place of a string id or a count
+
+FLAG_FALSE, FLAG_TRUE, FLAG_STRING = 0, 1, 2
+
+
+class ConfigStore(object):
+    """A read-only store of configs packed into a single buffer.
+
+    All strings are kept once in a string table and configs are stored as
+    arrays of offsets into it. :class:`UbiConfigView` objects returned by the
+    store decode attributes on access, so processes sharing the buffer, e.g.
+    forked workers using a memory-mapped file, don't copy the configs.
+
+    .. code-block:: python
+
+        >>> ConfigStore.write("configs.store", loader.load_all())
+        >>> with ConfigStore.open("configs.store") as store:
+        ...     store[0].packages.whitelist[0].name
+
+    The buffer can also be a :class:`multiprocessing.shared_memory.SharedMemory`
+    block filled with :meth:`pack`:
+
+    .. code-block:: python
+
+        >>> data = ConfigStore.pack(configs)
+        >>> shm = SharedMemory(create=True, size=len(data))
+        >>> shm.buf[: len(data)] = data
+        >>> store = ConfigStore(shm.buf)
+    """
+
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: a bytes-like object with data written by :meth:`pack`
+        """
+        self._mmap = None
+        if len(buffer) < HEADER.size:
+            raise ValueError("Buffer doesn't contain a ubiconfig store")
+        magic, version, _, marker, n_strings, n_configs, n_words = HEADER.unpack_from(
+            buffer
+        )
+        if magic != MAGIC:
+            raise ValueError("Buffer doesn't contain a ubiconfig store")
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                "Unsupported store format version %s, expected %s"
+                % (version, FORMAT_VERSION)
+            )
+        if marker != BYTE_ORDER_MARKER:
+            raise ValueError("The store was written with a different byte order")
+
+        # words are: string offsets, config positions and config records
+        words_end = HEADER.size + 4 * n_words
+        self._view = memoryview(buffer)
+        self._words = self._view[HEADER.size : words_end].cast("I")
+        self._blob = self._view[words_end:]
+        self._n_strings = n_strings
+        self._n_configs = n_configs
+        self._index = n_strings + 1
+
+    @classmethod
+    def open(cls, path):
+        """Open a store file written by :meth:`write` as a memory map."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            store = cls(mapped)
+        except ValueError:
+            mapped.close()
+            raise
+        store._mmap = mapped
+        return store
+
+    def close(self):
+        """Release the buffer, views of the store can't be used afterwards."""
+        self._words.release()
+        self._blob.release()
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._n_configs
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._n_configs
+        if not 0 <= index < self._n_configs:
+            raise IndexError("store index out of range")
+        return UbiConfigView(self, self._words[self._index + index])
+
+    def __iter__(self):
+        for index in range(self._n_configs):
+            yield self[index]
+
+    @property
+    def words(self):
+        """32-bit words of the store: string offsets, config positions and
+        config records, read by the views of the store.
+        """
+        return self._words
+
+    def string(self, string_id):
+        """Return the string with the given id, None for the ``NONE`` id."""
+        if string_id == NONE:
+            return None
+        start, end = self._words[string_id], self._words[string_id + 1]
+        return str(self._blob[start:end], "utf-8")
+
+    @classmethod
+    def pack(cls, configs):
+        """Pack :class:`~ubiconfig.UbiConfig` objects and return bytes which
+        can be used as the buffer of a store.
+        """
+        packer = _Packer()
+        positions = [packer.config(config) for config in configs]
+        strings = list(packer.strings)
+
+        blob = bytearray()
+        offsets = array("I", [0])
+        for string in strings:
+            blob += string.encode("utf-8")
+            offsets.append(len(blob))
+
+        # positions of configs are relative to the start of all words
+        base = len(offsets) + len(positions)
+        index = array("I", [base + position for position in positions])
+
+        words = offsets.tobytes() + index.tobytes() + packer.data.tobytes()
+        header = HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            0,
+            BYTE_ORDER_MARKER,
+            len(strings),
+            len(positions),
+            len(words) // 4,
+        )
+        return header + words + bytes(blob)
+
+    @classmethod
+    def write(cls, path, configs):
+        """Pack :class:`~ubiconfig.UbiConfig` objects to a store file.
+
+        The file is written atomically, so workers never open a partial store.
+        """
+        _atomic_write(path, [cls.pack(configs)])
+
+
+class _Packer(object):
+    """Encode configs as records of 32-bit words.
+
+    A config record is::
+
+        file_name version rpm_in rpm_out srpm_in srpm_out debug_in debug_out
+        n_arches arch*
+        n_whitelist (package name arch)*
+        n_blacklist (package name arch)*
+        n_modules (name stream n_profiles profile*)*
+        n_flags (name kind value)*
+
+    where strings are ids in the string table.
+    """
+
+    def __init__(self):
+        self.strings = {}
+        # {string: id}, in order of ids
+        self.data = array("I")
+
+    def string(self, value):
+        if value is None:
+            return NONE
+        return self.strings.setdefault(sys.intern(value), len(self.strings))
+
+    def config(self, config):
+        position = len(self.data)
+        cs = config.content_sets
+        self.data.extend(
+            self.string(value)
+            for value in (
+                config.file_name,
+                config.version,
+                cs.rpm.input,
+                cs.rpm.output,
+                cs.srpm.input,
+                cs.srpm.output,
+                cs.debuginfo.input,
+                cs.debuginfo.output,
+            )
+        )
+        self.sequence(self.string(arch) for arch in config.packages.arches)
+        for packages in (config.packages.whitelist, config.packages.blacklist):
+            self.data.append(len(packages))
+            for pkg in packages:
+                self.data.extend(
+                    (
+                        self.string(pkg.package),
+                        self.string(pkg.name),
+                        self.string(pkg.arch),
+                    )
+                )
+
+        self.data.append(len(config.modules.whitelist))
+        for module in config.modules.whitelist:
+            self.data.extend((self.string(module.name), self.string(module.stream)))
+            if module.profiles is None:
+                self.data.append(NONE)
+            else:
+                self.sequence(self.string(p) for p in module.profiles)
+
+        flags = list(config.flags)
+        self.data.append(len(flags))
+        for flag in flags:
+            if isinstance(flag.value, bool):
+                kind, value = (FLAG_TRUE if flag.value else FLAG_FALSE), NONE
+            elif isinstance(flag.value, str):
+                kind, value = FLAG_STRING, self.string(flag.value)
+            else:
+                raise ValueError(
+                    "Unsupported value %r of flag %s" % (flag.value, flag.name)
+                )
+            self.data.extend((self.string(flag.name), kind, value))
+
+        return position
+
+    def sequence(self, ids):
+        ids = list(ids)
+        self.data.append(len(ids))
+        self.data.extend(ids)
+
+
+class UbiConfigView(object):
+    """A view of a config in a :class:`ConfigStore`, with the same attributes
+    as :class:`~ubiconfig.UbiConfig`.
+    """
+
+    __slots__ = ("_store", "_pos", "_arches", "_whitelist", "_blacklist", "_modules")
+
+    def __init__(self, store, position):
+        self._store = store
+        self._pos = position
+        # find positions of variable length parts of the record
+        words = store.words
+        pos = position + 8
+        self._arches = pos
+        pos += 1 + words[pos]
+        self._whitelist = pos
+        pos += 1 + 3 * words[pos]
+        self._blacklist = pos
+        pos += 1 + 3 * words[pos]
+        self._modules = pos
+
+    def __repr__(self):
+        return self.file_name
+
+    def _field(self, offset):
+        return self._store.string(self._store.words[self._pos + offset])
+
+    @property
+    def file_name(self):
+        return self._field(0)
+
+    @property
+    def version(self):
+        return self._field(1)
+
+    @property
+    def content_sets(self):
+        return ContentSetsMapping(
+            Rpm(self._field(2), self._field(3)),
+            Srpm(self._field(4), self._field(5)),
+            Debuginfo(self._field(6), self._field(7)),
+        )
+
+    @property
+    def packages(self):
+        return PackagesView(self._store, self._arches, self._whitelist, self._blacklist)
+
+    @property
+    def modules(self):
+        return ModulesView(self._store, self._modules)
+
+    @property
+    def flags(self):
+        return FlagsView(self._store, self._flags_position())
+
+    def _flags_position(self):
+        words = self._store.words
+        pos = self._modules
+        count = words[pos]
+        pos += 1
+        for _ in range(count):
+            n_profiles = words[pos + 2]
+            pos += 3 + (0 if n_profiles == NONE else n_profiles)
+        return pos
+
+    def to_config(self):
+        """Return a :class:`~ubiconfig.UbiConfig` object of the view."""
+        return UbiConfig.load_from_dict(
+            self.export_dict(), self.file_name, self.version
+        )
+
+    def export_dict(self):
+        """See :meth:`ubiconfig.UbiConfig.export_dict`."""
+        cs = self.content_sets
+        mappings = [cs.rpm, cs.srpm, cs.debuginfo]
+        packages = self.packages
+        return {
+            "content_sets": dict(
+                (m.type, m.export_dict()) for m in mappings if m.input or m.output
+            ),
+            "packages": {
+                "include": [pkg.package for pkg in packages.whitelist],
+                "exclude": [pkg.package for pkg in packages.blacklist],
+            },
+            "arches": packages.arches,
+            "modules": {
+                "include": [module.export_dict() for module in self.modules.whitelist]
+            },
+            "flags": self.flags.as_dict(),
+        }
+
+
+class PackageView(object):
+    """A view of a package with the same attributes as
+    :class:`~ubiconfig.config_types.packages.Package`.
+    """
+
+    __slots__ = ("_store", "_pos")
+
+    def __init__(self, store, position):
+        self._store = store
+        self._pos = position
+
+    def __repr__(self):
+        return "<Package: %s>" % self.package
+
+    @property
+    def package(self):
+        return self._store.string(self._store.words[self._pos])
+
+    @property
+    def name(self):
+        return self._store.string(self._store.words[self._pos + 1])
+
+    @property
+    def arch(self):
+        return self._store.string(self._store.words[self._pos + 2])
+
+
+class _PackageList(Sequence):
+    __slots__ = ("_store", "_pos", "_count")
+
+    def __init__(self, store, position):
+        self._store = store
+        self._pos = position + 1
+        self._count = store.words[position]
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("list index out of range")
+        return PackageView(self._store, self._pos + 3 * index)
+
+
+class PackagesView(object):
+    """A view of packages with the same attributes as
+    :class:`~ubiconfig.config_types.packages.Packages`.
+    """
+
+    __slots__ = ("_store", "_arches", "whitelist", "blacklist")
+
+    def __init__(self, store, arches, whitelist, blacklist):
+        self._store = store
+        self._arches = arches
+        self.whitelist = _PackageList(store, whitelist)
+        self.blacklist = _PackageList(store, blacklist)
+
+    @property
+    def arches(self):
+        words = self._store.words
+        count = words[self._arches]
+        return [self._store.string(words[self._arches + 1 + i]) for i in range(count)]
+
+    def matcher(self):
+        """See :meth:`ubiconfig.config_types.packages.Packages.matcher`."""
+        return PackageMatcher(self.whitelist, self.blacklist)
+
+    def masks(self, names, arches=None):
+        """See :meth:`ubiconfig.config_types.packages.Packages.masks`."""
+        return self.matcher().masks(names, arches)
+
+
+class ModulesView(object):
+    """A view of modules with the same attributes as
+    :class:`~ubiconfig.config_types.modules.Modules`.
+
+    Lookups index the modules, which are short lists, on every call instead
+    of keeping the index in every process.
+    """
+
+    __slots__ = ("_store", "_pos")
+
+    def __init__(self, store, position):
+        self._store = store
+        self._pos = position
+
+    def _iter_modules(self):
+        words = self._store.words
+        string = self._store.string
+        pos = self._pos + 1
+        for _ in range(words[self._pos]):
+            n_profiles = words[pos + 2]
+            profiles = None
+            if n_profiles != NONE:
+                profiles = [string(words[pos + 3 + i]) for i in range(n_profiles)]
+            yield Module(string(words[pos]), string(words[pos + 1]), profiles)
+            pos += 3 + len(profiles or ())
+
+    @property
+    def whitelist(self):
+        return list(self._iter_modules())
+
+    def __getitem__(self, index):
+        return self.whitelist[index]
+
+    def contains(self, name, stream, profile=None):
+        """See :meth:`ubiconfig.config_types.modules.Modules.contains`."""
+        return Modules(self.whitelist).contains(name, stream, profile)
+
+    def streams_for(self, name):
+        """See :meth:`ubiconfig.config_types.modules.Modules.streams_for`."""
+        return Modules(self.whitelist).streams_for(name)
+
+
+class FlagsView(object):
+    """A view of flags with the same attributes as
+    :class:`~ubiconfig.config_types.flags.Flags`.
+    """
+
+    __slots__ = ("_store", "_pos")
+
+    def __init__(self, store, position):
+        self._store = store
+        self._pos = position
+
+    def __iter__(self):
+        words = self._store.words
+        string = self._store.string
+        pos = self._pos + 1
+        for _ in range(words[self._pos]):
+            kind = words[pos + 1]
+            if kind == FLAG_STRING:
+                value = string(words[pos + 2])
+            else:
+                value = kind == FLAG_TRUE
+            yield Flag(string(words[pos]), value)
+            pos += 3
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        for item in self:
+            if item.name == name:
+                return item
+
+    def as_dict(self):
+        return {item.name: item.value for item in self}
@@ -2,7 +2,7 @@ import logging
 import os
 from urllib.parse import urlparse
 
-from ._impl.loaders import _GitlabLoader, _LocalLoader
+from ._impl.loaders import _AsyncGitlabLoader, _GitlabLoader, _LocalLoader
 
 DEFAULT_UBI_REPO = os.getenv("DEFAULT_UBI_REPO", "")
 
@@ -13,7 +13,14 @@ class LoaderError(RuntimeError):
     pass
 
 
-def get_loader(source=None, branch_prefix=None):
+def get_loader(
+    source=None,
+    branch_prefix=None,
+    cache_dir=None,
+    versions=None,
+    asynchronous=False,
+    tree_path=None,
+):
     """Get a Loader instance which is used to load configurations.
 
     ``source`` should be provided as one of the following:
@@ -32,6 +39,33 @@ def get_loader(source=None, branch_prefix=None):
             environment variable is used. If this is unset, an
             exception is raised.
 
+    ``versions`` is an optional list of branch name globs, e.g. ``["ubi9*"]``.
+    Only trees of matching branches are ever listed by the remote loader,
+    and only matching version directories are scanned by the local loader.
+    Branches and files are discovered lazily, so loading a single file only
+    resolves the requested branch and its default fallback, or doesn't scan
+    the local directory at all.
+
+    ``tree_path`` is an optional directory of a remote repo, only config
+    files under it are listed. It's only supported for remote repos, a local
+    loader can be given the directory as ``source`` instead.
+
+    ``cache_dir`` is an optional directory where remote config files, and
+    parsed and validated local config files, are cached between runs
+    (e.g. ``$XDG_CACHE_HOME/ubiconfig``). If omitted, the value of the
+    ``UBICONFIG_CACHE_DIR`` environment variable is used; when neither is set,
+    nothing is cached.
+
+    If ``asynchronous`` is True, a loader for use with asyncio is returned.
+    It's only available for remote repos and requires the ``aiohttp`` package
+    (``pip install ubi-config[async]``). Its coroutines ``aload`` and
+    ``aload_all`` return the same objects as ``load`` and ``load_all``:
+
+    .. code-block:: python
+
+        >>> async with get_loader(asynchronous=True) as loader:
+        ...     configs = await loader.aload_all()
+
     After the loader is constructed, it can be used to load config files
     when given relative paths to config files.
 
@@ -60,10 +94,22 @@ def get_loader(source=None, branch_prefix=None):
     parsed = urlparse(source)
     if parsed.netloc:
         # It's a URL, use the gitlab loader
-        return _GitlabLoader(source, branch_prefix)
+        loader_class = _AsyncGitlabLoader if asynchronous else _GitlabLoader
+        return loader_class(
+            source,
+            branch_prefix,
+            cache_dir=cache_dir,
+            versions=versions,
+            tree_path=tree_path,
+        )
+
+    if asynchronous:
+        raise LoaderError("Asynchronous loading is only supported for remote repos")
+    if tree_path:
+        raise LoaderError("Tree path is only supported for remote repos")
 
     # It should be a local path
     if not os.path.isdir(source):
         raise LoaderError("'%s' is not an existing directory" % source)
 
-    return _LocalLoader(source)
+    return _LocalLoader(source, cache_dir=cache_dir, versions=versions)
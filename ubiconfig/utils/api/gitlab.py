@@ -2,7 +2,7 @@
 
 import os
 import re
-from urllib.parse import urljoin
+from urllib.parse import urlencode, urljoin
 
 DEFAULT_GIT_LAB_URL_FMT = re.compile(r"(?P<host>.+com|org|net)/(?P<project>.+)")
 
@@ -38,12 +38,36 @@ or set GIT_LAB_URL_FMT by yourself")
     def get_branch_list_api(self):
         return urljoin(self.api_url, "repository/branches")
 
-    def get_file_list_api(self, page, branch=None):
+    def get_branch_api(self, branch):
+        """Return the api used to get a single branch of the repo."""
+        return urljoin(
+            self.api_url, "repository/branches/%s" % branch.replace("/", "%2F")
+        )
+
+    def get_file_list_api(
+        self, page, branch=None, per_page=100, recursive=True, path=None, keyset=False
+    ):
         """Return the api used to get the list of files in the repo or files
         in the sub-module.
+
+        The tree is listed recursively with ``per_page`` entries per page.
+        ``path`` limits the listing to a directory of the repo. If ``keyset``
+        is True, keyset pagination is requested instead of ``page``; the next
+        pages are then linked from the ``Link`` header of the response.
         """
         branch = branch.replace("/", "%2F") if branch else "master"
-        return urljoin(self.api_url, "repository/tree?ref=%s&page=%s" % (branch, page))
+        params = [("per_page", per_page)]
+        if recursive:
+            params.append(("recursive", "true"))
+        if path:
+            params.append(("path", path))
+        if keyset:
+            params.append(("pagination", "keyset"))
+        else:
+            params.append(("page", page))
+        return urljoin(
+            self.api_url, "repository/tree?ref=%s&%s" % (branch, urlencode(params))
+        )
 
     def get_file_content_api(self, file_path, branch=None):
         """Get the api used to retrieve the raw content.
@@ -57,3 +81,12 @@ or set GIT_LAB_URL_FMT by yourself")
         return urljoin(
             self.api_url, "repository/files/%s/raw?ref=%s" % (encoded_file_path, branch)
         )
+
+    def get_archive_api(self, sha, path=None):
+        """Get the api used to download a tar.gz archive of the repository at
+        the given commit, optionally limited to the given path.
+        """
+        params = [("sha", sha)]
+        if path:
+            params.append(("path", path))
+        return urljoin(self.api_url, "repository/archive.tar.gz?%s" % urlencode(params))
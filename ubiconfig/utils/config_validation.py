@@ -1,16 +1,51 @@
 import json
 import os
+import threading
 
-from jsonschema import validate
+from jsonschema import validators
+from jsonschema.exceptions import best_match
 
 DEFAULT_SCHEMA = os.path.join(os.path.dirname(__file__), "config_schema.json")
 """ Default yaml schema used for validation of UbiConfig configuration files """
 
+_VALIDATORS = {}
+_LOCK = threading.Lock()
+
+
+def get_validator(schema=None):
+    """Return a compiled jsonschema validator for the schema.
+
+    If no schema is provided, :data:`DEFAULT_SCHEMA` is used. The schema is
+    checked and the validator is built only once; later calls with an equal
+    schema return the same validator.
+    """
+    if schema is None:
+        key = None
+    else:
+        key = json.dumps(schema, sort_keys=True)
+
+    validator = _VALIDATORS.get(key)
+    if validator is None:
+        with _LOCK:
+            validator = _VALIDATORS.get(key)
+            if validator is None:
+                if schema is None:
+                    with open(DEFAULT_SCHEMA) as f:
+                        schema = json.load(f)
+                else:
+                    # keep a private copy, the caller may modify the schema
+                    schema = json.loads(key)
+                cls = validators.validator_for(schema)
+                cls.check_schema(schema)
+                validator = cls(schema)
+                _VALIDATORS[key] = validator
+
+    return validator
+
 
 def validate_config(data, schema=None):
     """Validate the data according to the schema
     If no schema is provided, :data:`DEFAULT_SCHEMA` is used"""
-    if schema is None:
-        with open(DEFAULT_SCHEMA) as f:
-            schema = json.load(f)
-    validate(data, schema)
+    error = best_match(get_validator(schema).iter_errors(data))
+    if error is not None:
+        raise error